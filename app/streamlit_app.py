@@ -1,5 +1,6 @@
 import streamlit as st
 from seizure_score_ai.agents import process_clinical_note
+from seizure_score_ai.store import ResultsStore
 import re
 import base64
 import os
@@ -136,11 +137,25 @@ with col1:
         if not st.session_state['score_generated']:
             with st.spinner('Processing...'):
                 # Call the backend processing function
-                final_output, detailed_output = process_clinical_note(uploaded_file_string)
+                deadline_s = os.getenv("SEIZURE_SCORE_DEADLINE_S")
+                try:
+                    final_output, detailed_output = process_clinical_note(
+                        uploaded_file_string, deadline_s=float(deadline_s) if deadline_s else None,
+                        priority="interactive", tenant="streamlit"
+                    )
+                except TimeoutError as e:
+                    st.error(f"Scoring took too long and was stopped: {str(e)}. Please try again.")
+                    st.stop()
                 st.session_state['final_output'] = final_output
                 st.session_state['detailed_output'] = detailed_output
                 st.session_state['score_generated'] = True  # Set flag to avoid re-processing
 
+                # Keep results for cohort analytics if a results database is configured
+                results_db = os.getenv("SEIZURE_SCORE_RESULTS_DB")
+                if results_db:
+                    with ResultsStore(results_db) as store:
+                        store.save(uploaded_file_string, final_output, detailed_output)
+
         # Extract the ILAE score and explanations from the result
         ilae_score_raw = st.session_state['final_output'].get('ilae_score', "Not available")
         ilae_score = clean_ilae_score(ilae_score_raw)  # Clean up the ILAE score
@@ -0,0 +1,76 @@
+"""
+Throughput benchmark for the PHI de-identification pre-stage.
+
+Replicates the synthetic notes in data/test_notes up to a target corpus size
+and reports MB/s for a single core and for a process pool.
+
+Usage: python scripts/benchmark_deid.py --target-mb 50 --processes 4 --min-mbps 10
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from seizure_score_ai.deid import deidentify, deidentify_many
+
+NOTES_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'test_notes')
+
+
+def load_corpus(target_mb: float) -> list:
+    """Repeat the test notes until the corpus reaches target_mb megabytes."""
+    notes = []
+    for path in sorted(glob.glob(os.path.join(NOTES_DIR, "*.txt"))):
+        with open(path, "r", encoding="utf-8") as f:
+            notes.append(f.read())
+    if not notes:
+        raise FileNotFoundError(f"No notes found in {NOTES_DIR}")
+
+    corpus = []
+    size = 0
+    while size < target_mb * 1e6:
+        note = notes[len(corpus) % len(notes)]
+        corpus.append(note)
+        size += len(note.encode("utf-8"))
+    return corpus
+
+
+def measure(label: str, fn, corpus: list) -> float:
+    """Time fn over the corpus and print throughput."""
+    size_mb = sum(len(note.encode("utf-8")) for note in corpus) / 1e6
+    start = time.perf_counter()
+    results = fn(corpus)
+    elapsed = time.perf_counter() - start
+    mbps = size_mb / elapsed
+    spans = sum(len(result.spans) for result in results)
+    print(f"{label:<24} {size_mb:8.1f} MB  {elapsed:7.2f} s  {mbps:7.1f} MB/s  "
+          f"{len(corpus) / elapsed:9.0f} notes/s  {spans} spans")
+    return mbps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--target-mb", type=float, default=20.0, help="Corpus size to benchmark")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="Workers for the batch run")
+    parser.add_argument("--min-mbps", type=float, default=0.0,
+                        help="Exit non-zero if single-core throughput falls below this")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.target_mb)
+    print(f"Benchmarking de-identification on {len(corpus)} notes...")
+
+    single = measure("single core", lambda notes: [deidentify(note) for note in notes], corpus)
+    if args.processes and args.processes > 1:
+        measure(f"{args.processes} processes",
+                lambda notes: deidentify_many(notes, processes=args.processes), corpus)
+
+    if single < args.min_mbps:
+        print(f"FAIL: single-core throughput {single:.1f} MB/s is below {args.min_mbps} MB/s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
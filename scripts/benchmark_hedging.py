@@ -0,0 +1,98 @@
+"""
+Tail-latency benchmark for hedged requests.
+
+Runs the full three-stage pipeline against a local model with injected
+long-tail latency (latency.LatencyInjectingModel), once without hedging and
+once with it, and reports end-to-end p50/p95/p99 per note together with the
+hedge rate and the number of wasted calls. No API key is needed.
+
+Usage: python scripts/benchmark_hedging.py --notes 400 --median-ms 50 --stall-rate 0.03
+"""
+
+import argparse
+import asyncio
+import contextlib
+import glob
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from seizure_score_ai.agents import process_clinical_note_async
+from seizure_score_ai.latency import LatencyInjectingModel, StageExecutor, quantile
+
+NOTES_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'test_notes')
+
+CANNED_RESPONSES = {
+    "ClinicalInformationExtractor": json.dumps({
+        "presence_of_seizure_freedom": {"value": "No", "supporting_text": "two seizures since surgery"},
+        "presence_of_auras": {"value": "No", "supporting_text": "denies auras"},
+        "baseline_seizure_days": {"value": "96", "supporting_text": "eight seizure days a month"},
+        "seizure_days_per_year": {"value": "2", "supporting_text": "two seizures since surgery"},
+    }),
+    "ILAEScoreCalculator": json.dumps({
+        "ilae_score": "3", "detailed_explanation": "Fewer than four seizure days per year.",
+        "key_factors": ["two seizure days per year"],
+    }),
+    "ConciseExplanationReporter": json.dumps({"concise_explanation": "ILAE class 3."}),
+}
+
+
+def load_notes(count: int) -> list:
+    """Cycle through the test notes until there are count of them."""
+    notes = []
+    for path in sorted(glob.glob(os.path.join(NOTES_DIR, "*.txt"))):
+        with open(path, "r", encoding="utf-8") as f:
+            notes.append(f.read())
+    if not notes:
+        raise FileNotFoundError(f"No notes found in {NOTES_DIR}")
+    return [notes[i % len(notes)] for i in range(count)]
+
+
+async def run_corpus(notes: list, executor: StageExecutor, concurrency: int) -> list:
+    """Score every note, returning end-to-end latency in seconds per note."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def score(note):
+        async with semaphore:
+            started = time.monotonic()
+            await process_clinical_note_async(note, executor=executor)
+            latencies.append(time.monotonic() - started)
+
+    # The pipeline prints its progress; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(score(note) for note in notes))
+    return sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tail latency with and without hedging")
+    parser.add_argument("--notes", type=int, default=400, help="Notes to score per run")
+    parser.add_argument("--concurrency", type=int, default=20, help="Notes in flight at once")
+    parser.add_argument("--median-ms", type=float, default=50, help="Median model latency per call")
+    parser.add_argument("--stall-rate", type=float, default=0.03, help="Share of calls that stall")
+    parser.add_argument("--stall-factor", type=float, default=10, help="How much longer a stalled call takes")
+    parser.add_argument("--hedge-quantile", type=float, default=0.95, help="Latency quantile that triggers a hedge")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    notes = load_notes(args.notes)
+    print(f"{'hedging':<10}{'p50':>9}{'p95':>9}{'p99':>9}{'calls':>8}{'hedge rate':>12}{'wasted':>8}")
+    for hedge in (False, True):
+        model = LatencyInjectingModel(lambda agent, prompt: CANNED_RESPONSES[agent.name],
+                                      median_s=args.median_ms / 1000, stall_rate=args.stall_rate,
+                                      stall_factor=args.stall_factor, seed=args.seed)
+        executor = StageExecutor(model, hedge=hedge, hedge_quantile=args.hedge_quantile)
+        latencies = asyncio.run(run_corpus(notes, executor, args.concurrency))
+        metrics = executor.metrics()
+        p50, p95, p99 = (quantile(latencies, q) * 1000 for q in (0.5, 0.95, 0.99))
+        print(f"{'on' if hedge else 'off':<10}{p50:>7.0f}ms{p95:>7.0f}ms{p99:>7.0f}ms"
+              f"{metrics['calls']:>8}{metrics['hedge_rate']:>12.1%}{metrics['wasted_calls']:>8}")
+
+
+if __name__ == "__main__":
+    main()
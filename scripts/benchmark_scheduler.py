@@ -0,0 +1,86 @@
+"""
+Benchmark the scheduler with interactive notes arriving during a bulk backlog.
+
+A bulk backfill of many notes is submitted at once while interactive notes
+arrive at a steady rate, all sharing a fixed number of model-call slots.
+Compares first-come-first-served admission against the scheduler (priority
+classes, fair queuing between the two tenants and stage-aware ordering),
+reporting completion time per class and the peak bulk queue depth. Runs
+against latency.LatencyInjectingModel, so no API key is needed.
+
+Usage: python scripts/benchmark_scheduler.py --bulk 300 --interactive 20 --slots 8
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from seizure_score_ai.agents import process_clinical_note_async
+from seizure_score_ai.latency import LatencyInjectingModel, StageExecutor, quantile
+from seizure_score_ai.scheduler import AgentScheduler
+
+sys.path.insert(0, os.path.dirname(__file__))
+from benchmark_hedging import CANNED_RESPONSES, load_notes
+
+
+async def run_mixed_load(executor: StageExecutor, bulk: int, interactive: int, interval_s: float,
+                         fifo: bool) -> dict:
+    """Score the backlog and the interactive arrivals; return completion times per class."""
+    notes = load_notes(bulk + interactive)
+    completion = {"interactive": [], "bulk": []}
+
+    async def score(note, priority, tenant):
+        started = time.monotonic()
+        # With one class and one tenant, the scheduler admits calls in arrival order
+        job = {"priority": "api", "tenant": "default"} if fifo else {"priority": priority, "tenant": tenant}
+        await process_clinical_note_async(note, executor=executor, **job)
+        completion[priority].append(time.monotonic() - started)
+
+    async def arrivals():
+        tasks = []
+        for note in notes[bulk:]:
+            await asyncio.sleep(interval_s)
+            tasks.append(asyncio.ensure_future(score(note, "interactive", "clinic")))
+        await asyncio.gather(*tasks)
+
+    # The pipeline prints its progress; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(arrivals(), *(score(note, "bulk", "backfill") for note in notes[:bulk]))
+    return {priority: sorted(times) for priority, times in completion.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark interactive latency under a bulk backlog")
+    parser.add_argument("--bulk", type=int, default=300, help="Notes in the bulk backlog")
+    parser.add_argument("--interactive", type=int, default=20, help="Interactive notes arriving during it")
+    parser.add_argument("--interval-ms", type=float, default=100, help="Time between interactive arrivals")
+    parser.add_argument("--slots", type=int, default=8, help="Concurrent model calls allowed")
+    parser.add_argument("--median-ms", type=float, default=50, help="Median model latency per call")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'admission':<12}{'interactive p50':>17}{'p95':>9}{'bulk mean':>11}{'bulk max':>10}"
+          f"{'max bulk queue':>16}")
+    for fifo in (True, False):
+        model = LatencyInjectingModel(lambda agent, prompt: CANNED_RESPONSES[agent.name],
+                                      median_s=args.median_ms / 1000, seed=args.seed)
+        scheduler = AgentScheduler(max_concurrency=args.slots, stage_aware=not fifo)
+        executor = StageExecutor(model, scheduler=scheduler)
+        completion = asyncio.run(run_mixed_load(executor, args.bulk, args.interactive,
+                                                args.interval_ms / 1000, fifo))
+        interactive, bulk = completion["interactive"], completion["bulk"]
+        queues = scheduler.metrics()["classes"]
+        max_queue = queues["api"]["max_queued"] if fifo else queues["bulk"]["max_queued"]
+        print(f"{'fifo' if fifo else 'scheduler':<12}{quantile(interactive, 0.5):>16.2f}s"
+              f"{quantile(interactive, 0.95):>8.2f}s{sum(bulk) / len(bulk):>10.2f}s{bulk[-1]:>9.2f}s"
+              f"{max_queue:>16}")
+
+
+if __name__ == "__main__":
+    main()
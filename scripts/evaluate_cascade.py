@@ -0,0 +1,70 @@
+"""
+Evaluate model cascade configurations over a labelled note corpus.
+
+Expects notes with JSON sidecars as written by generate_clinic_notes.py
+(the gold label is the sidecar's "ilae_class").
+
+Usage: python scripts/evaluate_cascade.py --corpus generated_notes --configs flash,lite+flash,lite+pro
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from seizure_score_ai.cascade import (
+    CASCADE_CONFIGS, DEFAULT_THRESHOLD, evaluate_cascades, format_cascade_report
+)
+
+
+def load_labelled_corpus(corpus_dir: str, limit: int = 0) -> list:
+    """Load (note, gold class) pairs from a directory of notes with sidecars."""
+    corpus = []
+    for sidecar_path in sorted(glob.glob(os.path.join(corpus_dir, "*.json"))):
+        with open(sidecar_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        if "ilae_class" not in metadata:
+            continue
+        note_path = os.path.join(corpus_dir, metadata.get("file", os.path.basename(sidecar_path)[:-5] + ".txt"))
+        if not os.path.exists(note_path):
+            continue
+        with open(note_path, "r", encoding="utf-8") as f:
+            corpus.append((f.read(), str(metadata["ilae_class"])))
+        if limit and len(corpus) >= limit:
+            break
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate model cascade configurations")
+    parser.add_argument("--corpus", default="generated_notes", help="Directory of notes with JSON sidecars")
+    parser.add_argument("--configs", default=",".join(CASCADE_CONFIGS),
+                        help="Comma-separated names from CASCADE_CONFIGS, or tier chains like lite+pro")
+    parser.add_argument("--baseline", default="flash", help="Config the accuracy delta is measured against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--limit", type=int, default=0, help="Evaluate at most this many notes")
+    parser.add_argument("--output", help="Also write the report as JSON to this path")
+    args = parser.parse_args()
+
+    corpus = load_labelled_corpus(args.corpus, args.limit)
+    if not corpus:
+        print(f"No labelled notes found in {args.corpus}")
+        sys.exit(1)
+
+    # "+" chains tiers; ">" is still accepted when the argument is quoted
+    configs = {name: CASCADE_CONFIGS.get(name, re.split(r"[+>]", name)) for name in args.configs.split(",")}
+    print(f"Evaluating {len(configs)} cascade configs on {len(corpus)} notes...")
+    report = evaluate_cascades(corpus, configs, baseline=args.baseline, threshold=args.threshold)
+    print(format_cascade_report(report))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,122 @@
+"""
+Synthetic clinic note generator for load-test and accuracy corpora.
+
+Generates notes concurrently with one shared async Gemini client. Each note
+is planned up front with a target ILAE class and a length profile, and a
+JSON sidecar next to the note records the gold label and the seizure
+figures the note was written from. Re-running with the same output
+directory and seed resumes where the last run stopped.
+
+Usage:
+    python scripts/generate_clinic_notes.py --num-notes 10000 --concurrency 32 \
+        --distribution 1=0.4,2=0.1,3=0.15,4=0.15,5=0.15,6=0.05 \
+        --profiles short=0.3,typical=0.5,multi-year=0.2
+"""
+
 from google import genai
+import argparse
+import asyncio
+import glob
+import json
 import os
-from typing import Optional
+import random
+import re
+import time
+import zlib
+from typing import Dict, List, Optional, Set, Tuple
 
 from dotenv import load_dotenv
 load_dotenv()
 
+DEFAULT_MODEL = "gemini-2.5-flash"
+ILAE_CLASSES = ["1", "2", "3", "4", "5", "6"]
+
+LENGTH_PROFILES = {
+    "short": "a brief follow-up note of roughly 250-350 words covering only the essentials",
+    "typical": "a full clinic note of similar length and detail to the example",
+    "multi-year": (
+        "a longitudinal note summarising at least three dated follow-up visits over "
+        "3-5 years since surgery, with the seizure outcome changing between visits; "
+        "the figures below describe the most recent year"
+    ),
+}
+
+EXAMPLE_CLINIC_NOTE = """
+Epilepsy Surgery Clinic Note  
+Date: November 17, 2024  
+Patient: Mr. John Turko  
+Age: 26 years  
+Hospital Number: 12345678  
+Referring Physician: Dr. Jane Smith, Neurology  
+
+Reason for Review:  
+Post-operative follow-up after left anterior temporal lobectomy for drug-resistant epilepsy.  
+
+Diagnosis:  
+- Pre-surgical: Drug-resistant focal epilepsy with confirmed left temporal lobe seizure onset.  
+- Post-surgical: Focal epilepsy, post-resection, seizure-free since January 2023 surgery.  
+
+History:  
+Current Antiepileptic Medication:  
+Levetiracetam 500 mg twice daily, well-tolerated without side effects.  
+
+Previous Antiepileptic Medications:  
+- Lamotrigine: Discontinued in 2015 due to rash and inadequate seizure control.  
+- Carbamazepine: Discontinued in 2016 due to drowsiness and suboptimal control of seizures.  
+
+Pre-Surgical Seizure History:  
+- First Seizures (2014): Experienced two generalized tonic-clonic seizures without aura or prodrome. Witnesses noted possible preceding right leg jerking lasting a few seconds. Postictal confusion lasted approximately 20 minutes.  
+- "Absence-like" Episodes (2014–2022): Weekly episodes of staring and unresponsiveness lasting 5–10 seconds. Mr. Turko was unaware of these events and relied on observations by family and colleagues.  
+- Childhood Seizures: Febrile seizures between the ages of 2–4 years, resolved without long-term effects.  
+- Family History: No family history of epilepsy, neurological conditions, or febrile seizures. His two children are healthy without seizure activity.  
+
+Surgical History:  
+- Surgery Date: January 15, 2023.  
+- Procedure: Left anterior temporal lobectomy.  
+- Intraoperative Findings: Resected area included the left hippocampus and anterior temporal cortex, with pathology confirming hippocampal sclerosis.  
+- Post-operative Course: Uncomplicated recovery, with no neurological deficits or infections.  
+
+Post-Surgical Seizure Status:  
+- Seizure-Free Period: 22 months since surgery.  
+- Functional Outcomes: Resumed full-time work as a graphic designer and driving in February 2024 after meeting the seizure-free guidelines.  
+
+Investigations:  
+Pre-surgical Workup:  
+- MRI (2022): Demonstrated left mesial temporal sclerosis with hippocampal atrophy, no other structural abnormalities.  
+- Video EEG Monitoring (2022): Recorded five clinical seizures, all with onset in the left temporal lobe. No secondary generalization observed.  
+- Neuropsychological Assessment: Mild impairment in verbal memory consistent with left temporal dysfunction.  
+- PET Scan (2022): Hypometabolism localized to the left temporal lobe, further supporting focal epilepsy diagnosis.  
+
+Post-surgical Investigations:  
+- MRI (2023): Post-resection changes in the left anterior temporal lobe without evidence of residual or new pathology.  
+- EEG (2023): Normal background activity without epileptiform discharges.  
+
+Clinical Assessment:  
+Mr. Turko was seen in the epilepsy clinic today for his routine post-surgical follow-up. He reports no seizures, staring spells, or other episodes suggestive of epilepsy since his surgery. He has experienced no medication side effects and feels well overall. He has returned to driving, as well as to full-time work. His sleep quality and mood are good, and he denies symptoms of anxiety or depression.  
+
+Neurological examination was unremarkable, with no focal deficits. Cognitive testing in clinic revealed no changes in memory or attention since the pre-surgical neuropsychological assessment. Physical examination, including gait and coordination, was normal.  
+
+Discussion and Plan:  
+I congratulated Mr. Turko on his excellent post-surgical outcome and discussed the importance of maintaining his current treatment regimen. He was counseled on the ongoing, albeit reduced, risk of seizure recurrence even after successful surgery. The following key points were emphasized:  
+1. Long-term continuation of levetiracetam to minimize the risk of recurrence.  
+2. Lifestyle modifications, including adequate sleep, regular meals, stress management, and avoiding known triggers such as excessive alcohol.  
+3. The rare but serious risk of sudden unexpected death in epilepsy (SUDEP), which is significantly lower given his seizure freedom.  
+
+We discussed his prognosis, including the likelihood of sustained seizure freedom and potential medication tapering in the distant future if seizure freedom persists. I emphasized the need for close monitoring before any changes are made to his treatment.  
+
+Follow-up Plan:  
+- Routine follow-up in 12 months, or sooner if symptoms recur or if he has questions.  
+- Referral to neuropsychology for repeat cognitive testing in 2025 to assess long-term memory outcomes post-surgery.  
+
+Mr. Turko expressed his satisfaction with his care and stated he feels optimistic about his quality of life moving forward. He understands he can contact the clinic if needed.  
+
+Signed:  
+[Your Name, MD]  
+Consultant Epileptologist  
+[Hospital Name]  
+"""
+
+
 def setup_client() -> genai.Client:
     """Setup and verify the Gemini client with API key"""
     # Try to get API key from environment variable
@@ -18,152 +130,339 @@ def setup_client() -> genai.Client:
         )
 
     os.environ["GEMINI_API_KEY"] = api_key
-    
+
     return genai.Client()
 
-def generate_clinic_note() -> Optional[str]:
-    try:
-        client = setup_client()
-        
-        # Example clinic note string here...
-        example_clinic_note = """
-        Epilepsy Surgery Clinic Note  
-        Date: November 17, 2024  
-        Patient: Mr. John Turko  
-        Age: 26 years  
-        Hospital Number: 12345678  
-        Referring Physician: Dr. Jane Smith, Neurology  
-    
-        Reason for Review:  
-        Post-operative follow-up after left anterior temporal lobectomy for drug-resistant epilepsy.  
-    
-        Diagnosis:  
-        - Pre-surgical: Drug-resistant focal epilepsy with confirmed left temporal lobe seizure onset.  
-        - Post-surgical: Focal epilepsy, post-resection, seizure-free since January 2023 surgery.  
-    
-        History:  
-        Current Antiepileptic Medication:  
-        Levetiracetam 500 mg twice daily, well-tolerated without side effects.  
-    
-        Previous Antiepileptic Medications:  
-        - Lamotrigine: Discontinued in 2015 due to rash and inadequate seizure control.  
-        - Carbamazepine: Discontinued in 2016 due to drowsiness and suboptimal control of seizures.  
-    
-        Pre-Surgical Seizure History:  
-        - First Seizures (2014): Experienced two generalized tonic-clonic seizures without aura or prodrome. Witnesses noted possible preceding right leg jerking lasting a few seconds. Postictal confusion lasted approximately 20 minutes.  
-        - "Absence-like" Episodes (2014–2022): Weekly episodes of staring and unresponsiveness lasting 5–10 seconds. Mr. Turko was unaware of these events and relied on observations by family and colleagues.  
-        - Childhood Seizures: Febrile seizures between the ages of 2–4 years, resolved without long-term effects.  
-        - Family History: No family history of epilepsy, neurological conditions, or febrile seizures. His two children are healthy without seizure activity.  
-    
-        Surgical History:  
-        - Surgery Date: January 15, 2023.  
-        - Procedure: Left anterior temporal lobectomy.  
-        - Intraoperative Findings: Resected area included the left hippocampus and anterior temporal cortex, with pathology confirming hippocampal sclerosis.  
-        - Post-operative Course: Uncomplicated recovery, with no neurological deficits or infections.  
-    
-        Post-Surgical Seizure Status:  
-        - Seizure-Free Period: 22 months since surgery.  
-        - Functional Outcomes: Resumed full-time work as a graphic designer and driving in February 2024 after meeting the seizure-free guidelines.  
-    
-        Investigations:  
-        Pre-surgical Workup:  
-        - MRI (2022): Demonstrated left mesial temporal sclerosis with hippocampal atrophy, no other structural abnormalities.  
-        - Video EEG Monitoring (2022): Recorded five clinical seizures, all with onset in the left temporal lobe. No secondary generalization observed.  
-        - Neuropsychological Assessment: Mild impairment in verbal memory consistent with left temporal dysfunction.  
-        - PET Scan (2022): Hypometabolism localized to the left temporal lobe, further supporting focal epilepsy diagnosis.  
-    
-        Post-surgical Investigations:  
-        - MRI (2023): Post-resection changes in the left anterior temporal lobe without evidence of residual or new pathology.  
-        - EEG (2023): Normal background activity without epileptiform discharges.  
-    
-        Clinical Assessment:  
-        Mr. Turko was seen in the epilepsy clinic today for his routine post-surgical follow-up. He reports no seizures, staring spells, or other episodes suggestive of epilepsy since his surgery. He has experienced no medication side effects and feels well overall. He has returned to driving, as well as to full-time work. His sleep quality and mood are good, and he denies symptoms of anxiety or depression.  
-    
-        Neurological examination was unremarkable, with no focal deficits. Cognitive testing in clinic revealed no changes in memory or attention since the pre-surgical neuropsychological assessment. Physical examination, including gait and coordination, was normal.  
-    
-        Discussion and Plan:  
-        I congratulated Mr. Turko on his excellent post-surgical outcome and discussed the importance of maintaining his current treatment regimen. He was counseled on the ongoing, albeit reduced, risk of seizure recurrence even after successful surgery. The following key points were emphasized:  
-        1. Long-term continuation of levetiracetam to minimize the risk of recurrence.  
-        2. Lifestyle modifications, including adequate sleep, regular meals, stress management, and avoiding known triggers such as excessive alcohol.  
-        3. The rare but serious risk of sudden unexpected death in epilepsy (SUDEP), which is significantly lower given his seizure freedom.  
-    
-        We discussed his prognosis, including the likelihood of sustained seizure freedom and potential medication tapering in the distant future if seizure freedom persists. I emphasized the need for close monitoring before any changes are made to his treatment.  
-    
-        Follow-up Plan:  
-        - Routine follow-up in 12 months, or sooner if symptoms recur or if he has questions.  
-        - Referral to neuropsychology for repeat cognitive testing in 2025 to assess long-term memory outcomes post-surgery.  
-    
-        Mr. Turko expressed his satisfaction with his care and stated he feels optimistic about his quality of life moving forward. He understands he can contact the clinic if needed.  
-    
-        Signed:  
-        [Your Name, MD]  
-        Consultant Epileptologist  
-        [Hospital Name]  
-        """
-
-        # Create the prompt with system instructions and user request
-        prompt = f"""You are an experienced epileptologist creating detailed clinical notes. Generate realistic, 
-        professional clinic notes that maintain patient confidentiality while including comprehensive medical details. 
-        Follow standard medical documentation practices and ensure all relevant clinical information is included.
-
-        Using the following example clinic note as a template, generate a detailed clinic note 
-        for a different patient who has undergone epilepsy surgery. Include similar sections and formatting, 
-        and ensure to include information about the patient's:
-        - Auras
-        - Seizure frequency before surgery (days per year)
-        - Seizure frequency after surgery (days per year)
-        - Current seizure freedom status
-        - All relevant clinical details
-        
-        The note should maintain the same level of detail and professional medical terminology as the example.
-        All dates should be current relative to today's date of November 17, 2024.
-        Make the note realistic and comparable to real clinic notes, with different patient details and medical history.
-
-        Example Clinic Note:
-        {example_clinic_note}
-        """
-
-        # Generate content using Gemini 2.5 Flash API
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt
-        )
-        
-        return response.text
-
-    except ValueError as ve:
-        print(f"Authentication Error: {str(ve)}")
-        return None
-    except Exception as e:
-        print(f"Unexpected error: {str(e)}")
-        return None
-
-def save_clinic_note(note: str, index: int, output_dir: str = "generated_notes"):
-    """Save the generated clinic note to a file"""
+
+def parse_distribution(spec: str, keys: List[str]) -> Dict[str, float]:
+    """Parse "a=0.4,b=0.6" into normalised weights over keys."""
+    if not spec:
+        return {key: 1.0 / len(keys) for key in keys}
+    weights = {}
+    for item in spec.split(","):
+        key, _, weight = item.partition("=")
+        key = key.strip()
+        if key not in keys:
+            raise ValueError(f"Unknown key '{key}' in distribution (expected one of {', '.join(keys)})")
+        weights[key] = float(weight)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("Distribution weights must sum to more than zero")
+    return {key: weight / total for key, weight in weights.items() if weight > 0}
+
+
+def allocate(weights: Dict[str, float], total: int) -> List[str]:
+    """Turn weights into exactly `total` labels using largest-remainder rounding."""
+    exact = {key: weight * total for key, weight in weights.items()}
+    counts = {key: int(value) for key, value in exact.items()}
+    leftover = total - sum(counts.values())
+    for key in sorted(exact, key=lambda k: exact[k] - counts[k], reverse=True)[:leftover]:
+        counts[key] += 1
+    return [key for key in weights for _ in range(counts[key])]
+
+
+def sample_outcome(ilae_class: str, rng: random.Random) -> Dict:
+    """Draw seizure figures that put a patient unambiguously in ilae_class."""
+    baseline = rng.randint(12, 200)
+    auras = rng.random() < 0.5
+    if ilae_class == "1":
+        post, auras = 0, False
+    elif ilae_class == "2":
+        post, auras = 0, True
+    elif ilae_class == "3":
+        post = rng.randint(1, 3)
+    elif ilae_class == "4":
+        baseline = rng.randint(20, 200)
+        post = rng.randint(4, baseline // 2)
+    elif ilae_class == "5":
+        baseline = rng.randint(10, 150)
+        post = rng.randint(baseline // 2 + 1, min(baseline * 2, 365))
+    else:
+        baseline = rng.randint(5, 100)
+        post = rng.randint(baseline * 2 + 1, min(baseline * 3 + 1, 365))
+    return {
+        "ilae_class": ilae_class,
+        "baseline_seizure_days": baseline,
+        "seizure_days_per_year": post,
+        "auras": auras,
+        "seizure_free": post == 0 and not auras,
+    }
+
+
+def build_plan(num_notes: int, class_weights: Dict[str, float],
+               profile_weights: Dict[str, float], seed: int) -> List[Dict]:
+    """
+    Assign a target class, length profile and seizure figures to every note.
+
+    The plan depends only on its arguments, so a resumed run regenerates
+    exactly the notes that are missing.
+    """
+    rng = random.Random(seed)
+    classes = allocate(class_weights, num_notes)
+    profiles = allocate(profile_weights, num_notes)
+    rng.shuffle(classes)
+    rng.shuffle(profiles)
+    return [
+        {"index": i + 1, "length_profile": profile, **sample_outcome(ilae_class, rng)}
+        for i, (ilae_class, profile) in enumerate(zip(classes, profiles))
+    ]
+
+
+def build_prompt(spec: Dict, attempt: int) -> str:
+    """Create the generation prompt for one planned note."""
+    aura_text = "does experience auras" if spec["auras"] else "has no auras"
+    if spec["seizure_days_per_year"] == 0:
+        post_text = "had no seizures other than any auras"
+    else:
+        post_text = f"had seizures on {spec['seizure_days_per_year']} days"
+
+    return f"""You are an experienced epileptologist creating detailed clinical notes. Generate realistic,
+professional clinic notes that maintain patient confidentiality while including comprehensive medical details.
+Follow standard medical documentation practices and ensure all relevant clinical information is included.
+
+Using the following example clinic note as a template, generate {LENGTH_PROFILES[spec['length_profile']]}
+for a different patient who has undergone epilepsy surgery. Include similar sections and formatting,
+and ensure to include information about the patient's:
+- Auras
+- Seizure frequency before surgery (days per year)
+- Seizure frequency after surgery (days per year)
+- Current seizure freedom status
+- All relevant clinical details
+
+The patient's outcome must be consistent with these facts:
+- Before surgery they had seizures on about {spec['baseline_seizure_days']} days per year
+- In the most recent year since surgery the patient {post_text}
+- The patient {aura_text}
+
+State these figures in the note the way a clinician would, but do not mention the ILAE class.
+Invent a new name, age, surgery, history and phrasing (variation {spec['index']}.{attempt}).
+All dates should be current relative to today's date of November 17, 2024.
+Make the note realistic and comparable to real clinic notes, with different patient details and medical history.
+
+Example Clinic Note:
+{EXAMPLE_CLINIC_NOTE}
+"""
+
+
+class NearDuplicateIndex:
+    """
+    MinHash/LSH index over word 5-shingles.
+
+    Signatures are 64 hashes split into 16 bands of 4; notes that share a band
+    are compared on their estimated Jaccard similarity. Memory stays at one
+    small signature per note, which is what makes 100k-note corpora workable.
+    """
+
+    NUM_HASHES = 64
+    BANDS = 16
+    PRIME = (1 << 61) - 1
+
+    def __init__(self, threshold: float = 0.8):
+        self.threshold = threshold
+        # Fixed seed: signatures must be comparable with those from earlier runs
+        rng = random.Random(0)
+        self._params = [(rng.randrange(1, self.PRIME), rng.randrange(self.PRIME))
+                        for _ in range(self.NUM_HASHES)]
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+        self._signatures: Dict[int, Tuple[int, ...]] = {}
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        # crc32 rather than hash() so signatures stored in sidecars stay valid across runs
+        words = re.findall(r"[a-z0-9]+", text.lower())
+        shingles = {zlib.crc32(" ".join(words[i:i + 5]).encode()) for i in range(max(1, len(words) - 4))}
+        return tuple(min((a * s + b) % self.PRIME for s in shingles) for a, b in self._params)
+
+    def _bands(self, signature: Tuple[int, ...]):
+        rows = self.NUM_HASHES // self.BANDS
+        for band in range(self.BANDS):
+            yield band, signature[band * rows:(band + 1) * rows]
+
+    def find(self, signature: Tuple[int, ...]) -> Optional[Tuple[int, float]]:
+        """Return (note index, similarity) of the closest near-duplicate, if any."""
+        candidates: Set[int] = set()
+        for key in self._bands(signature):
+            candidates.update(self._buckets.get(key, ()))
+        best = None
+        for index in candidates:
+            other = self._signatures[index]
+            similarity = sum(x == y for x, y in zip(signature, other)) / self.NUM_HASHES
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (index, similarity)
+        return best
+
+    def add(self, index: int, signature: Tuple[int, ...]):
+        self._signatures[index] = signature
+        for key in self._bands(signature):
+            self._buckets.setdefault(key, []).append(index)
+
+
+def note_paths(index: int, output_dir: str) -> Tuple[str, str]:
+    """Return the note and sidecar paths for a note index."""
+    base = os.path.join(output_dir, f"clinic_note_{index}")
+    return base + ".txt", base + ".json"
+
+
+def save_clinic_note(note: str, metadata: Dict, output_dir: str = "generated_notes"):
+    """
+    Save a generated clinic note and its gold-label sidecar.
+
+    The sidecar is written last and atomically, so its presence marks the
+    note as complete for resumed runs.
+    """
     os.makedirs(output_dir, exist_ok=True)
-    filename = os.path.join(output_dir, f"clinic_note_{index}.txt")
-    with open(filename, "w", encoding="utf-8") as f:
+    note_path, sidecar_path = note_paths(metadata["index"], output_dir)
+    with open(note_path, "w", encoding="utf-8") as f:
         f.write(note)
-    print(f"Saved clinic note {index} to {filename}")
+    with open(sidecar_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(sidecar_path + ".tmp", sidecar_path)
+
+
+# Sidecar fields that must match the plan for a note to count as done
+RESUME_KEYS = ("seed", "ilae_class", "length_profile")
+
+
+def load_completed(output_dir: str, index: NearDuplicateIndex, plan: List[Dict],
+                   seed: int) -> Tuple[Set[int], int]:
+    """
+    Find notes finished by earlier runs and seed the near-duplicate index with them.
+
+    A note only counts as done if its sidecar matches the planned spec at its
+    index. Changing --num-notes, --distribution, --profiles or --seed
+    reshuffles the plan, so mismatched notes are regenerated rather than kept
+    with the wrong gold label.
+
+    Returns:
+        Tuple of (completed note indices, number of stale notes to regenerate)
+    """
+    planned = {spec["index"]: {**spec, "seed": seed} for spec in plan}
+    completed = set()
+    stale = 0
+    for sidecar_path in glob.glob(os.path.join(output_dir, "clinic_note_*.json")):
+        with open(sidecar_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        note_path, _ = note_paths(metadata["index"], output_dir)
+        if not os.path.exists(note_path):
+            continue
+        spec = planned.get(metadata["index"])
+        if spec is None:
+            continue
+        if any(metadata.get(key) != spec[key] for key in RESUME_KEYS):
+            stale += 1
+            continue
+        signature = metadata.get("minhash")
+        if signature is None:
+            with open(note_path, "r", encoding="utf-8") as f:
+                signature = index.signature(f.read())
+        index.add(metadata["index"], tuple(signature))
+        completed.add(metadata["index"])
+    return completed, stale
+
+
+async def generate_clinic_note(client: genai.Client, spec: Dict, model: str,
+                               attempt: int = 0, retries: int = 3) -> Optional[str]:
+    """Generate one note for a planned spec, retrying transient API errors with backoff."""
+    prompt = build_prompt(spec, attempt)
+    for retry in range(retries + 1):
+        try:
+            response = await client.aio.models.generate_content(model=model, contents=prompt)
+            return response.text
+        except Exception as e:
+            if retry == retries:
+                print(f"Failed to generate clinic note {spec['index']}: {str(e)}")
+                return None
+            await asyncio.sleep(2 ** retry + random.random())
+
+
+async def generate_corpus(client: genai.Client, plan: List[Dict], output_dir: str, model: str,
+                          concurrency: int, dedup: NearDuplicateIndex,
+                          max_dedup_attempts: int, seed: int) -> Dict[str, int]:
+    """Generate every planned note with at most `concurrency` requests in flight."""
+    queue: asyncio.Queue = asyncio.Queue()
+    for spec in plan:
+        queue.put_nowait(spec)
+    stats = {"generated": 0, "failed": 0, "duplicates_rejected": 0}
+    started = time.perf_counter()
+
+    async def worker():
+        while True:
+            try:
+                spec = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            for attempt in range(max_dedup_attempts):
+                note = await generate_clinic_note(client, spec, model, attempt)
+                if note is None:
+                    stats["failed"] += 1
+                    break
+                signature = dedup.signature(note)
+                duplicate = dedup.find(signature)
+                if duplicate is not None:
+                    stats["duplicates_rejected"] += 1
+                    print(f"Clinic note {spec['index']} is a near-duplicate of note {duplicate[0]} "
+                          f"(similarity {duplicate[1]:.2f}), regenerating...")
+                    continue
+                dedup.add(spec["index"], signature)
+                save_clinic_note(note, {
+                    **spec,
+                    "file": os.path.basename(note_paths(spec["index"], output_dir)[0]),
+                    "model": model,
+                    "seed": seed,
+                    "attempts": attempt + 1,
+                    "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "minhash": list(signature),
+                }, output_dir)
+                stats["generated"] += 1
+                if stats["generated"] % 50 == 0 or stats["generated"] == len(plan):
+                    rate = stats["generated"] / (time.perf_counter() - started)
+                    print(f"Generated {stats['generated']}/{len(plan)} notes ({rate:.1f} notes/s)")
+                break
+            else:
+                stats["failed"] += 1
+                print(f"Gave up on clinic note {spec['index']} after {max_dedup_attempts} near-duplicates")
+
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, len(plan)))))
+    return stats
+
 
 def main():
-    num_notes = 10  # Number of clinic notes to generate
-    
+    parser = argparse.ArgumentParser(description="Generate a synthetic clinic note corpus")
+    parser.add_argument("--num-notes", type=int, default=10, help="Total notes in the corpus")
+    parser.add_argument("--output-dir", default="generated_notes")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum requests in flight")
+    parser.add_argument("--distribution", default="",
+                        help="Target ILAE class mix, e.g. 1=0.4,2=0.1,3=0.2,4=0.1,5=0.1,6=0.1 (default: uniform)")
+    parser.add_argument("--profiles", default="short=0.25,typical=0.5,multi-year=0.25",
+                        help="Note length mix over short, typical and multi-year")
+    parser.add_argument("--dedup-threshold", type=float, default=0.8,
+                        help="Estimated Jaccard similarity above which a note is regenerated")
+    parser.add_argument("--max-dedup-attempts", type=int, default=3)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--seed", type=int, default=0, help="Keep fixed across resumed runs")
+    args = parser.parse_args()
+
     try:
-        setup_client()
+        client = setup_client()
+        class_weights = parse_distribution(args.distribution, ILAE_CLASSES)
+        profile_weights = parse_distribution(args.profiles, list(LENGTH_PROFILES))
     except ValueError as e:
         print(f"Setup Error: {str(e)}")
         return
 
-    for i in range(num_notes):
-        print(f"\nGenerating clinic note {i+1}...")
-        note = generate_clinic_note()
-        
-        if note:
-            save_clinic_note(note, i+1)
-            print(f"Successfully generated clinic note {i+1}")
-        else:
-            print(f"Failed to generate clinic note {i+1}")
+    plan = build_plan(args.num_notes, class_weights, profile_weights, args.seed)
+    dedup = NearDuplicateIndex(args.dedup_threshold)
+    completed, stale = load_completed(args.output_dir, dedup, plan, args.seed)
+    remaining = [spec for spec in plan if spec["index"] not in completed]
+    if stale:
+        print(f"{stale} notes in {args.output_dir} do not match the current plan "
+              f"(different --num-notes, --distribution, --profiles or --seed) and will be regenerated")
+    print(f"{len(completed)} notes already in {args.output_dir}, generating {len(remaining)}...")
+
+    stats = asyncio.run(generate_corpus(client, remaining, args.output_dir, args.model,
+                                        args.concurrency, dedup, args.max_dedup_attempts, args.seed))
+    print(f"Done: {stats['generated']} generated, {stats['failed']} failed, "
+          f"{stats['duplicates_rejected']} near-duplicates rejected")
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
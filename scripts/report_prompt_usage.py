@@ -0,0 +1,66 @@
+"""
+Report per-stage prompt tokens for the compact inter-agent prompts against
+the original prose prompts, over a folder of clinical notes. Estimated
+tokens (used for budgeting) are shown next to the counts Gemini reported.
+
+Runs the full pipeline, so GEMINI_API_KEY must be set.
+
+Usage: python scripts/report_prompt_usage.py --notes data/test_notes
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from seizure_score_ai.agents import STAGES, process_clinical_note
+from seizure_score_ai.prompts import summarize_usage
+
+NOTES_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'test_notes')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report prompt token usage per pipeline stage")
+    parser.add_argument("--notes", default=NOTES_DIR, help="Directory of .txt clinical notes")
+    parser.add_argument("--calculator-budget", type=int, help="Override the calculator token budget")
+    parser.add_argument("--reporter-budget", type=int, help="Override the reporter token budget")
+    parser.add_argument("--output", help="Also write the summary as JSON to this path")
+    args = parser.parse_args()
+
+    budgets = {}
+    if args.calculator_budget:
+        budgets["calculator"] = args.calculator_budget
+    if args.reporter_budget:
+        budgets["reporter"] = args.reporter_budget
+
+    diagnostics = []
+    for path in sorted(glob.glob(os.path.join(args.notes, "*.txt"))):
+        with open(path, "r", encoding="utf-8") as f:
+            note = f.read()
+        try:
+            _, detailed_output = process_clinical_note(note, token_budgets=budgets, priority="bulk")
+        except Exception as e:
+            print(f"Failed on {os.path.basename(path)}: {str(e)}")
+            continue
+        diagnostics.append(detailed_output["diagnostics"])
+
+    summary = summarize_usage(diagnostics)
+    print(f"\n{'stage':<12}{'runs':>6}{'tokens':>10}{'legacy':>10}{'saving':>9}{'over budget':>13}"
+          f"{'reported':>10}")
+    for stage in STAGES:
+        if stage in summary:
+            total = summary[stage]
+            reported = str(total['reported_prompt_tokens']) if not total['unreported_runs'] else "n/a"
+            print(f"{stage:<12}{total['runs']:>6}{total['prompt_tokens']:>10}{total['legacy_prompt_tokens']:>10}"
+                  f"{total['saving']:>9.1%}{total['over_budget']:>13}{reported:>10}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
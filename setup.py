@@ -2,7 +2,7 @@ from setuptools import setup, find_packages
 
 setup(
     name="seizure_score_ai",
-    version="0.1.0",
+    version="0.2.0",
     description="AI-powered ILAE seizure score calculator",
     author="Vineet Reddy",
     package_dir={"": "src"},
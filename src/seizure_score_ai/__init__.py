@@ -1,7 +1,15 @@
 """SeizureScoreAI: Multi-Agent Clinical Reasoning System for ILAE Outcome Scoring"""
 
-from .agents import process_clinical_note
-
-__version__ = "0.1.0"
+# Bumped whenever prompts, de-identification or parsing change in a way that
+# can change scores; the results store records it with every row.
+__version__ = "0.2.0"
 __all__ = ["process_clinical_note"]
 
+
+def __getattr__(name):
+    # The pipeline (and google-adk) loads on first use, so the store,
+    # analytics and parsing modules can be imported without it
+    if name == "process_clinical_note":
+        from .agents import process_clinical_note
+        return process_clinical_note
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
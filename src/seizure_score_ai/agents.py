@@ -20,7 +20,13 @@ import json
 import uuid
 import asyncio
 import re
-from typing import Dict, Tuple
+import time
+from typing import Dict, Optional, Tuple
+
+from .deid import DeidentifiedNote, deidentify
+from .latency import Deadline, StageExecutor
+from .scheduler import DEFAULT_PRIORITY, DEFAULT_TENANT, AgentScheduler, job_context
+from . import prompts
 
 # Load environment variables
 load_dotenv(verbose=True)
@@ -30,10 +36,46 @@ if api_key:
 
 GEMINI_MODEL = "gemini-3-flash-preview"
 
+# Named tiers, cheapest first. Stage models may be given as a tier or a model id.
+MODEL_TIERS = {
+    "lite": "gemini-2.5-flash-lite",
+    "flash": GEMINI_MODEL,
+    "pro": "gemini-3-pro-preview",
+}
 
-def run_agent(agent: LlmAgent, prompt: str, app_name: str) -> str:
+STAGES = ("extractor", "calculator", "reporter")
+
+
+def resolve_stage_models(models: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """
+    Resolve the model used by each pipeline stage.
+
+    Precedence: the ``models`` argument, then ``SEIZURE_SCORE_<STAGE>_MODEL``
+    environment variables, then GEMINI_MODEL.
+    
+    Args:
+        models: Optional mapping of stage name to tier name or model id
+        
+    Returns:
+        Mapping of every stage to a model id
     """
-    Run an ADK agent with a prompt and return the response.
+    models = models or {}
+    unknown = set(models) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown pipeline stage(s): {', '.join(sorted(unknown))}")
+    resolved = {}
+    for stage in STAGES:
+        choice = models.get(stage) or os.getenv(f"SEIZURE_SCORE_{stage.upper()}_MODEL") or GEMINI_MODEL
+        resolved[stage] = MODEL_TIERS.get(choice, choice)
+    return resolved
+
+
+async def run_agent_async(agent: LlmAgent, prompt: str, app_name: str) -> Tuple[str, Optional[Dict[str, int]]]:
+    """
+    Run an ADK agent with a prompt and return the response with its token usage.
+    
+    Cancelling the calling task closes the agent's event stream, so a
+    timed-out or hedged-away request stops rather than running on unseen.
     
     Args:
         agent: The LlmAgent to run
@@ -41,14 +83,16 @@ def run_agent(agent: LlmAgent, prompt: str, app_name: str) -> str:
         app_name: Application name for session
         
     Returns:
-        The agent's response as a string
+        Tuple of (response text, token usage) where usage holds the
+        prompt_tokens and response_tokens reported by the API, or None if
+        no event carried usage metadata
     """
     session_service = InMemorySessionService()
     session_id = str(uuid.uuid4())
     user_id = "default_user"
     
     # Create session and runner
-    asyncio.run(session_service.create_session(app_name=app_name, user_id=user_id, session_id=session_id))
+    await session_service.create_session(app_name=app_name, user_id=user_id, session_id=session_id)
     runner = Runner(app_name=app_name, agent=agent, session_service=session_service)
     
     # Create message and run agent
@@ -56,17 +100,42 @@ def run_agent(agent: LlmAgent, prompt: str, app_name: str) -> str:
     
     # Collect response from event stream
     response_text = ""
-    for event in runner.run(user_id=user_id, session_id=session_id, new_message=message):
-        if hasattr(event, 'content') and event.content:
-            if hasattr(event.content, 'parts'):
-                for part in event.content.parts:
-                    if hasattr(part, 'text') and part.text:
-                        response_text += part.text
+    usage = None
+    events = runner.run_async(user_id=user_id, session_id=session_id, new_message=message)
+    try:
+        async for event in events:
+            # Each complete model response reports its own usage; streamed partials repeat it
+            metadata = getattr(event, 'usage_metadata', None)
+            if metadata and metadata.prompt_token_count is not None and not getattr(event, 'partial', False):
+                usage = usage or {"prompt_tokens": 0, "response_tokens": 0}
+                usage["prompt_tokens"] += metadata.prompt_token_count
+                usage["response_tokens"] += metadata.candidates_token_count or 0
+            if hasattr(event, 'content') and event.content:
+                if hasattr(event.content, 'parts'):
+                    for part in event.content.parts:
+                        if hasattr(part, 'text') and part.text:
+                            response_text += part.text
+    finally:
+        await events.aclose()
     
+    return response_text, usage
+
+
+def run_agent(agent: LlmAgent, prompt: str, app_name: str) -> str:
+    """Synchronous wrapper around run_agent_async, returning the response text."""
+    response_text, _ = asyncio.run(run_agent_async(agent, prompt, app_name))
     return response_text
 
 
-def create_clinical_extractor_agent() -> LlmAgent:
+# Shared so hedging can learn each stage's latency across notes, and so every
+# caller in the process queues for the same model quota.
+# Set SEIZURE_SCORE_HEDGE=1 to hedge slow stages by default.
+DEFAULT_SCHEDULER = AgentScheduler(max_concurrency=int(os.getenv("SEIZURE_SCORE_MAX_CONCURRENCY", "8")))
+DEFAULT_EXECUTOR = StageExecutor(run_agent_async, hedge=os.getenv("SEIZURE_SCORE_HEDGE") == "1",
+                                 scheduler=DEFAULT_SCHEDULER)
+
+
+def create_clinical_extractor_agent(model: str = GEMINI_MODEL) -> LlmAgent:
     """Creates the Clinical Information Extractor agent."""
     
     instruction = """You are a clinical information extractor. Extract these entities from the clinical note:
@@ -77,6 +146,7 @@ def create_clinical_extractor_agent() -> LlmAgent:
 4. **Seizure days per year (post-treatment)** (Numeric value or "I don't know")
 
 For each entity, provide the value and exact supporting text from the note.
+Bracketed placeholders such as [NAME_1] or [DATE_2] stand in for redacted identifiers; copy them verbatim.
 
 **Output only valid JSON in this format:**
 
@@ -101,13 +171,13 @@ For each entity, provide the value and exact supporting text from the note.
 
     return LlmAgent(
         name="ClinicalInformationExtractor",
-        model=GEMINI_MODEL,
+        model=model,
         instruction=instruction,
         description="Extracts structured clinical information from patient notes"
     )
 
 
-def create_ilae_calculator_agent() -> LlmAgent:
+def create_ilae_calculator_agent(model: str = GEMINI_MODEL) -> LlmAgent:
     """Creates the ILAE Score Calculator agent."""
     
     instruction = """You are a medical expert specializing in epilepsy. Calculate the ILAE score using these criteria:
@@ -120,27 +190,29 @@ def create_ilae_calculator_agent() -> LlmAgent:
 - **Class 5**: Less than 50% reduction of baseline seizure days; ± auras
 - **Class 6**: More than 100% increase of baseline seizure days; ± auras
 
-Provide detailed reasoning citing the supporting texts. If you cannot determine the score, set "ilae_score" to "indeterminate".
+Provide detailed reasoning citing the supporting texts. Evidence ids such as E1 only label quotes in the input; quote the text itself, not the id. If you cannot determine the score, set "ilae_score" to "indeterminate".
+List up to three short key factors that decided the score.
 
 **Output only valid JSON in this format:**
 
 {
   "ilae_score": "...",
-  "detailed_explanation": "..."
+  "detailed_explanation": "...",
+  "key_factors": ["..."]
 }"""
 
     return LlmAgent(
         name="ILAEScoreCalculator",
-        model=GEMINI_MODEL,
+        model=model,
         instruction=instruction,
         description="Calculates ILAE outcome scores based on clinical data"
     )
 
 
-def create_concise_reporter_agent() -> LlmAgent:
+def create_concise_reporter_agent(model: str = GEMINI_MODEL) -> LlmAgent:
     """Creates the Concise Explanation Reporter agent."""
     
-    instruction = """Summarize the detailed ILAE explanation into a clear, concise summary for the frontend.
+    instruction = """Summarize the ILAE result (score, extracted facts, key factors and reasoning) into a clear, concise summary for the frontend.
 
 **Output only valid JSON in this format:**
 
@@ -150,7 +222,7 @@ def create_concise_reporter_agent() -> LlmAgent:
 
     return LlmAgent(
         name="ConciseExplanationReporter",
-        model=GEMINI_MODEL,
+        model=model,
         instruction=instruction,
         description="Generates concise explanations of ILAE scores"
     )
@@ -158,96 +230,208 @@ def create_concise_reporter_agent() -> LlmAgent:
 
 def parse_json_response(response_text: str) -> Dict:
     """Parse JSON from agent response, handling potential formatting issues."""
+    return _parse_json_with_repair(response_text)[0]
+
+
+def _parse_json_with_repair(response_text: str) -> Tuple[Dict, bool]:
+    """Parse JSON from agent response, also reporting whether it had to be repaired."""
     try:
-        return json.loads(response_text)
+        return json.loads(response_text), False
     except json.JSONDecodeError:
         # Try to extract JSON from response
         json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
         if json_match:
-            return json.loads(json_match.group())
+            return json.loads(json_match.group()), True
         raise ValueError("Could not parse response as JSON")
 
 
-def process_clinical_note(clinical_note: str) -> Tuple[Dict, Dict]:
+def _reidentify(value, deid: DeidentifiedNote):
+    """Restore redacted identifiers throughout a parsed agent response."""
+    if isinstance(value, str):
+        return deid.reidentify(value)
+    if isinstance(value, dict):
+        return {key: _reidentify(item, deid) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_reidentify(item, deid) for item in value]
+    return value
+
+
+async def _run_stage(stage: str, agent: LlmAgent, prompt: str, app_name: str, diagnostics: Dict,
+                     executor: Optional[StageExecutor] = None, deadline: Optional[Deadline] = None) -> Dict:
+    """
+    Run one pipeline stage, recording its model, latency, the token usage
+    reported by the API and whether its JSON needed repair or the request
+    was hedged.
+    """
+    executor = executor or DEFAULT_EXECUTOR
+    timeout = deadline.stage_timeout(STAGES[STAGES.index(stage):]) if deadline else None
+    started = time.perf_counter()
+    response, hedged = await executor.run(stage, agent, prompt, app_name, timeout)
+    # Runners other than run_agent_async (fakes, benchmarks) may return the text alone
+    response, usage = response if isinstance(response, tuple) else (response, None)
+    if usage:
+        prompts.record_reported_usage(diagnostics, stage, usage)
+    result, repaired = _parse_json_with_repair(response)
+    diagnostics.setdefault("models", {})[stage] = agent.model
+    diagnostics.setdefault("stage_latency_s", {})[stage] = time.perf_counter() - started
+    if repaired:
+        diagnostics.setdefault("json_repaired", []).append(stage)
+    if hedged:
+        diagnostics.setdefault("hedged", []).append(stage)
+    return result
+
+
+def percent_reduction_of(extracted_entities: Dict):
+    """Percent reduction from baseline seizure days, or "I don't know"."""
+    baseline = extracted_entities['baseline_seizure_days']['value']
+    post = extracted_entities['seizure_days_per_year']['value']
+    
+    try:
+        if str(baseline).lower() == "i don't know" or str(post).lower() == "i don't know":
+            return "I don't know"
+        baseline_val = float(baseline)
+        post_val = float(post)
+        return ((baseline_val - post_val) / baseline_val) * 100 if baseline_val > 0 else 0
+    except (ValueError, TypeError):
+        return "I don't know"
+
+
+async def extract_entities(deid: DeidentifiedNote, model: str, diagnostics: Dict,
+                           budget: int = prompts.DEFAULT_TOKEN_BUDGETS["extractor"],
+                           executor: Optional[StageExecutor] = None,
+                           deadline: Optional[Deadline] = None) -> Dict:
+    """Stage 1: extract structured clinical information from a de-identified note."""
+    prompt = f"Extract clinical information from this note:\n\n{deid.text}"
+    # The note is measured but never trimmed: dropping text could drop the evidence
+    prompts.record_usage(diagnostics, "extractor", prompt, budget)
+    return await _run_stage("extractor", create_clinical_extractor_agent(model), prompt,
+                            "ClinicalExtractor", diagnostics, executor, deadline)
+
+
+async def calculate_ilae_score(extracted_entities: Dict, model: str, diagnostics: Dict,
+                               budget: int = prompts.DEFAULT_TOKEN_BUDGETS["calculator"],
+                               executor: Optional[StageExecutor] = None,
+                               deadline: Optional[Deadline] = None) -> Dict:
+    """Stage 2: calculate the ILAE score from extracted entities."""
+    percent_reduction = percent_reduction_of(extracted_entities)
+    prompt = prompts.build_calculation_prompt(extracted_entities, percent_reduction, budget)
+    prompts.record_usage(diagnostics, "calculator", prompt, budget,
+                         prompts.build_legacy_calculation_prompt(extracted_entities, percent_reduction))
+    return await _run_stage("calculator", create_ilae_calculator_agent(model), prompt,
+                            "ILAECalculator", diagnostics, executor, deadline)
+
+
+async def report_concise_explanation(ilae_result: Dict, extracted_entities: Dict, model: str,
+                                     diagnostics: Dict,
+                                     budget: int = prompts.DEFAULT_TOKEN_BUDGETS["reporter"],
+                                     executor: Optional[StageExecutor] = None,
+                                     deadline: Optional[Deadline] = None) -> Dict:
+    """Stage 3: summarise the score and its key factors for the frontend."""
+    prompt = prompts.build_report_prompt(ilae_result, extracted_entities, budget)
+    prompts.record_usage(diagnostics, "reporter", prompt, budget,
+                         prompts.build_legacy_report_prompt(ilae_result))
+    return await _run_stage("reporter", create_concise_reporter_agent(model), prompt,
+                            "ConciseReporter", diagnostics, executor, deadline)
+
+
+def assemble_outputs(deid: DeidentifiedNote, extracted_entities: Dict, ilae_result: Dict,
+                     concise_result: Dict, diagnostics: Dict) -> Tuple[Dict, Dict]:
+    """Build the (final_output, detailed_output) pair, re-identifying model output."""
+    final_output = {
+        "ilae_score": ilae_result['ilae_score'],
+        "concise_explanation": deid.reidentify(concise_result['concise_explanation']),
+        "extracted_entities": _reidentify(extracted_entities, deid)
+    }
+    
+    detailed_output = {
+        "detailed_explanation": deid.reidentify(ilae_result['detailed_explanation']),
+        "diagnostics": diagnostics
+    }
+    return final_output, detailed_output
+
+
+def process_clinical_note(clinical_note: str, redact_phi: bool = True,
+                          models: Optional[Dict[str, str]] = None,
+                          token_budgets: Optional[Dict[str, int]] = None,
+                          deadline_s: Optional[float] = None,
+                          executor: Optional[StageExecutor] = None,
+                          priority: str = DEFAULT_PRIORITY, tenant: str = DEFAULT_TENANT) -> Tuple[Dict, Dict]:
     """
     Process a clinical note through the ADK multi-agent pipeline.
     
     Args:
         clinical_note: Raw clinical note text
+        redact_phi: Replace names, MRNs, dates, phone numbers and addresses
+            with placeholders before the note is sent to the model. Outputs
+            are re-identified locally, so supporting texts still match the
+            original note.
+        models: Optional per-stage model ("extractor", "calculator",
+            "reporter" mapped to a tier name from MODEL_TIERS or a model id)
+        token_budgets: Optional per-stage prompt budgets in estimated tokens,
+            overriding prompts.DEFAULT_TOKEN_BUDGETS
+        deadline_s: Optional end-to-end time limit in seconds, split into
+            per-stage timeouts (latency.STAGE_DEADLINE_SHARES)
+        executor: StageExecutor that runs the agent calls (default:
+            DEFAULT_EXECUTOR); pass one with hedge=True to hedge slow stages
+        priority: Scheduling class for the agent calls: "interactive",
+            "api" or "bulk" (see scheduler.py)
+        tenant: Client the calls are accounted to for fair queuing
         
     Returns:
         Tuple of (final_output, detailed_output) where:
         - final_output contains: ilae_score, concise_explanation, extracted_entities
-        - detailed_output contains: detailed_explanation
+        - detailed_output contains: detailed_explanation, diagnostics (models,
+          per-stage latency and prompt tokens, stages whose JSON needed repair
+          or whose request was hedged)
+    
+    Raises:
+        latency.StageTimeoutError: if a stage runs past its share of deadline_s
     """
+    return asyncio.run(process_clinical_note_async(
+        clinical_note, redact_phi, models, token_budgets, deadline_s, executor, priority, tenant
+    ))
+
+
+async def process_clinical_note_async(clinical_note: str, redact_phi: bool = True,
+                                      models: Optional[Dict[str, str]] = None,
+                                      token_budgets: Optional[Dict[str, int]] = None,
+                                      deadline_s: Optional[float] = None,
+                                      executor: Optional[StageExecutor] = None,
+                                      priority: str = DEFAULT_PRIORITY,
+                                      tenant: str = DEFAULT_TENANT) -> Tuple[Dict, Dict]:
+    """Async version of process_clinical_note, for callers already in an event loop."""
+    with job_context(priority, tenant):
+        return await _process_clinical_note(clinical_note, redact_phi, models, token_budgets,
+                                            deadline_s, executor)
+
+
+async def _process_clinical_note(clinical_note: str, redact_phi: bool, models: Optional[Dict[str, str]],
+                                 token_budgets: Optional[Dict[str, int]], deadline_s: Optional[float],
+                                 executor: Optional[StageExecutor]) -> Tuple[Dict, Dict]:
     
     print("Initializing ADK multi-agent system...")
+    stage_models = resolve_stage_models(models)
+    budgets = {**prompts.DEFAULT_TOKEN_BUDGETS, **(token_budgets or {})}
+    execution = {"executor": executor, "deadline": Deadline(deadline_s) if deadline_s else None}
+    diagnostics: Dict = {}
+    
+    # Step 0: De-identify so PHI never leaves the process
+    deid = deidentify(clinical_note) if redact_phi else DeidentifiedNote(text=clinical_note)
     
     # Step 1: Extract clinical information
     print("Step 1: Clinical Information Extraction...")
-    extractor = create_clinical_extractor_agent()
-    extraction_response = run_agent(
-        extractor, 
-        f"Extract clinical information from this note:\n\n{clinical_note}",
-        app_name="ClinicalExtractor"
-    )
-    extracted_entities = parse_json_response(extraction_response)
-    
-    # Calculate percent reduction for context
-    baseline = extracted_entities['baseline_seizure_days']['value']
-    post = extracted_entities['seizure_days_per_year']['value']
-    
-    try:
-        if str(baseline).lower() == "i don't know" or str(post).lower() == "i don't know":
-            percent_reduction = "I don't know"
-        else:
-            baseline_val = float(baseline)
-            post_val = float(post)
-            percent_reduction = ((baseline_val - post_val) / baseline_val) * 100 if baseline_val > 0 else 0
-    except (ValueError, TypeError):
-        percent_reduction = "I don't know"
+    extracted_entities = await extract_entities(deid, stage_models["extractor"], diagnostics,
+                                                budgets["extractor"], **execution)
     
     # Step 2: Calculate ILAE score
     print("Step 2: ILAE Score Calculation...")
-    calculator = create_ilae_calculator_agent()
-    calculation_prompt = f"""Calculate the ILAE score using this information:
-
-**Extracted Entities and Supporting Texts:**
-1. Presence of seizure freedom: {extracted_entities['presence_of_seizure_freedom']['value']}
-   - Supporting text: {extracted_entities['presence_of_seizure_freedom']['supporting_text']}
-2. Presence of auras: {extracted_entities['presence_of_auras']['value']}
-   - Supporting text: {extracted_entities['presence_of_auras']['supporting_text']}
-3. Baseline seizure days: {baseline}
-   - Supporting text: {extracted_entities['baseline_seizure_days']['supporting_text']}
-4. Seizure days per year: {post}
-   - Supporting text: {extracted_entities['seizure_days_per_year']['supporting_text']}
-5. Percent reduction: {percent_reduction}
-
-Calculate the ILAE score."""
-    
-    calculation_response = run_agent(calculator, calculation_prompt, app_name="ILAECalculator")
-    ilae_result = parse_json_response(calculation_response)
+    ilae_result = await calculate_ilae_score(extracted_entities, stage_models["calculator"], diagnostics,
+                                             budgets["calculator"], **execution)
     
     # Step 3: Generate concise explanation
     print("Step 3: Generating Concise Explanation...")
-    reporter = create_concise_reporter_agent()
-    concise_response = run_agent(
-        reporter,
-        f"Summarize this detailed explanation:\n\n{ilae_result['detailed_explanation']}",
-        app_name="ConciseReporter"
-    )
-    concise_result = parse_json_response(concise_response)
-    
-    # Prepare final outputs
-    final_output = {
-        "ilae_score": ilae_result['ilae_score'],
-        "concise_explanation": concise_result['concise_explanation'],
-        "extracted_entities": extracted_entities
-    }
-    
-    detailed_output = {
-        "detailed_explanation": ilae_result['detailed_explanation']
-    }
+    concise_result = await report_concise_explanation(ilae_result, extracted_entities, stage_models["reporter"],
+                                                      diagnostics, budgets["reporter"], **execution)
     
     print("ADK multi-agent processing complete!")
-    return final_output, detailed_output
+    return assemble_outputs(deid, extracted_entities, ilae_result, concise_result, diagnostics)
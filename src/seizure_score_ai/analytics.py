@@ -0,0 +1,159 @@
+"""
+Cohort Outcome Analytics
+
+Aggregations over a ResultsStore. Grouping, counting, quantiles and
+patient-level ordering all run inside SQLite (GROUP BY and window
+functions over indexed columns), so only the aggregated rows reach Python,
+whether the store holds hundreds or hundreds of thousands of results.
+
+Every function takes the same filters as ResultsStore.query (ilae_class,
+patient_key, date_from, date_to, surgery_type, model, pipeline_version).
+"""
+
+from typing import Dict, Iterator, List, Optional
+
+from .store import ResultsStore
+
+# Columns results can be grouped by, as SQL expressions
+GROUP_BY = {
+    "surgery_type": "surgery_type",
+    "model": "model",
+    "pipeline_version": "pipeline_version",
+    "year": "substr(note_date, 1, 4)",
+    "month": "substr(note_date, 1, 7)",
+    "auras": "auras",
+}
+
+
+def _group_expression(by: Optional[str]) -> str:
+    if by is None:
+        return "'all'"
+    if by not in GROUP_BY:
+        raise ValueError(f"Cannot group by '{by}' (expected one of {', '.join(GROUP_BY)})")
+    return GROUP_BY[by]
+
+
+def _year_filters(year: Optional[int], filters: Dict) -> Dict:
+    if year is not None:
+        filters = {**filters, "date_from": f"{year}-01-01", "date_to": f"{year + 1}-01-01"}
+    return filters
+
+
+def class_distribution(store: ResultsStore, by: Optional[str] = "surgery_type",
+                       year: Optional[int] = None, **filters) -> List[Dict]:
+    """
+    ILAE class counts and within-group shares.
+
+    Args:
+        store: Results to analyse
+        by: Grouping from GROUP_BY, or None for the whole cohort
+        year: Only notes dated in this calendar year
+
+    Returns:
+        Rows of {group, ilae_score, count, share}, sorted by group then class
+    """
+    group = _group_expression(by)
+    where, params = store.where(**_year_filters(year, filters))
+    rows = store.connection.execute(f"""
+        SELECT {group} AS grp, ilae_score, COUNT(*) AS n,
+               1.0 * COUNT(*) / SUM(COUNT(*)) OVER (PARTITION BY {group}) AS share
+        FROM results{where}
+        GROUP BY grp, ilae_score
+        ORDER BY grp, ilae_score
+    """, params)
+    return [{"group": row[0], "ilae_score": row[1], "count": row[2], "share": row[3]} for row in rows]
+
+
+def percent_reduction_stats(store: ResultsStore, by: Optional[str] = None,
+                            year: Optional[int] = None, **filters) -> List[Dict]:
+    """
+    Distribution of percent reduction in seizure days from baseline.
+
+    Quantiles use the nearest-rank method, computed in SQL from row numbers
+    within each group.
+
+    Returns:
+        Rows of {group, count, mean, min, p25, median, p75, max,
+        responder_rate}, where responder_rate is the share with >= 50% reduction
+    """
+    group = _group_expression(by)
+    where, params = store.where(**_year_filters(year, filters))
+    where = (where + " AND" if where else " WHERE") + " percent_reduction IS NOT NULL"
+    rows = store.connection.execute(f"""
+        WITH ranked AS (
+            SELECT {group} AS grp, percent_reduction AS x,
+                   ROW_NUMBER() OVER (PARTITION BY {group} ORDER BY percent_reduction) AS rn,
+                   COUNT(*) OVER (PARTITION BY {group}) AS n
+            FROM results{where}
+        )
+        SELECT grp, MAX(n), AVG(x), MIN(x),
+               MAX(CASE WHEN rn = (n + 3) / 4 THEN x END),
+               MAX(CASE WHEN rn = (n + 1) / 2 THEN x END),
+               MAX(CASE WHEN rn = (3 * n + 3) / 4 THEN x END),
+               MAX(x), AVG(x >= 50)
+        FROM ranked
+        GROUP BY grp
+        ORDER BY grp
+    """, params)
+    keys = ["group", "count", "mean", "min", "p25", "median", "p75", "max", "responder_rate"]
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def outcome_trajectories(store: ResultsStore, **filters) -> Iterator[Dict]:
+    """
+    Each patient's scored notes in date order, with the change from the previous note.
+
+    Streams rows, so it is safe on large stores.
+
+    Yields:
+        {patient_key, note_date, ilae_class, previous_class, change}, where
+        change is "first", "improved", "worsened", "stable" or None when
+        either class is indeterminate
+    """
+    where, params = store.where(**filters)
+    where = (where + " AND" if where else " WHERE") + " patient_key IS NOT NULL"
+    cursor = store.connection.execute(f"""
+        SELECT patient_key, note_date, ilae_class,
+               LAG(ilae_class) OVER w AS previous_class,
+               ROW_NUMBER() OVER w AS visit
+        FROM results{where}
+        WINDOW w AS (PARTITION BY patient_key ORDER BY note_date, id)
+        ORDER BY patient_key, note_date, id
+    """, params)
+    for patient, note_date, ilae_class, previous_class, visit in cursor:
+        if visit == 1:
+            change = "first"
+        elif ilae_class is None or previous_class is None:
+            change = None
+        elif ilae_class < previous_class:
+            change = "improved"
+        elif ilae_class > previous_class:
+            change = "worsened"
+        else:
+            change = "stable"
+        yield {"patient_key": patient, "note_date": note_date, "ilae_class": ilae_class,
+               "previous_class": previous_class, "change": change}
+
+
+def transition_matrix(store: ResultsStore, **filters) -> List[Dict]:
+    """
+    Counts of class-to-class transitions between consecutive notes of a patient.
+
+    Returns:
+        Rows of {from_class, to_class, count}
+    """
+    where, params = store.where(**filters)
+    where = (where + " AND" if where else " WHERE") + " patient_key IS NOT NULL"
+    rows = store.connection.execute(f"""
+        WITH ordered AS (
+            SELECT ilae_class AS to_class,
+                   LAG(ilae_class) OVER (PARTITION BY patient_key ORDER BY note_date, id) AS from_class
+            FROM results{where}
+        )
+        SELECT from_class, to_class, COUNT(*)
+        FROM ordered
+        WHERE from_class IS NOT NULL AND to_class IS NOT NULL
+        GROUP BY from_class, to_class
+        ORDER BY from_class, to_class
+    """, params)
+    return [{"from_class": row[0], "to_class": row[1], "count": row[2]} for row in rows]
@@ -0,0 +1,273 @@
+"""
+Confidence-based Model Cascade
+
+Runs extraction and scoring on a cheap, fast model tier first and re-runs
+only the notes it is unsure about on a stronger tier. Confidence comes from
+signals that need no extra model calls:
+
+    - the model's class disagrees with a class derived from the extracted
+      values by the ILAE rules
+    - the model answered "indeterminate"
+    - extracted values are "I don't know" or lack supporting text
+    - a response was not valid JSON and had to be repaired
+    - a response could not be parsed at all or lacked expected fields
+      (confidence 0; the last tier's failure is raised to the caller)
+
+The concise reporter runs once, after the cascade has settled on a score.
+With a deadline, escalation is skipped when the time left would not cover
+another attempt.
+"""
+
+import asyncio
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from . import agents
+from .deid import DeidentifiedNote, deidentify
+from .latency import Deadline, StageExecutor
+from .parsing import normalize_ilae_score, parse_seizure_days, parse_yes_no
+from .scheduler import DEFAULT_PRIORITY, DEFAULT_TENANT, job_context
+
+# Cascades to compare, each a list of tiers from agents.MODEL_TIERS (cheapest first)
+CASCADE_CONFIGS = {
+    "flash": ["flash"],
+    "lite": ["lite"],
+    "lite+flash": ["lite", "flash"],
+    "lite+pro": ["lite", "pro"],
+    "flash+pro": ["flash", "pro"],
+}
+
+CONFIDENCE_PENALTIES = {
+    "rule_model_disagree": 0.5,
+    "model_indeterminate": 0.3,
+    "rule_undetermined": 0.2,
+    "unknown_value": 0.1,
+    "missing_supporting_text": 0.1,
+    "json_repaired": 0.15,
+}
+
+DEFAULT_THRESHOLD = 0.7
+
+
+def rule_based_ilae_class(extracted_entities: Dict) -> Optional[str]:
+    """
+    Derive the ILAE class from extracted values using the scale's rules.
+
+    Returns None when the values do not pin down a single class.
+    """
+    seizure_free = parse_yes_no(extracted_entities['presence_of_seizure_freedom']['value'])
+    auras = parse_yes_no(extracted_entities['presence_of_auras']['value'])
+    baseline = parse_seizure_days(extracted_entities['baseline_seizure_days']['value'])
+    post = parse_seizure_days(extracted_entities['seizure_days_per_year']['value'])
+
+    if post == 0 or (seizure_free and post is None):
+        if auras is None:
+            return None
+        return "2" if auras else "1"
+    if post is None:
+        return None
+    if post <= 3:
+        return "3"
+    if not baseline:
+        return None
+    if post > 2 * baseline:
+        return "6"
+    if post <= 0.5 * baseline:
+        return "4"
+    return "5"
+
+
+def assess_confidence(extracted_entities: Dict, ilae_result: Dict,
+                      diagnostics: Dict) -> Tuple[float, List[str]]:
+    """
+    Score confidence in a stage-1/stage-2 result from 0 to 1.
+
+    Returns:
+        Tuple of (confidence, reasons), where reasons names each penalty applied
+    """
+    reasons = []
+    model_class = normalize_ilae_score(ilae_result.get('ilae_score'))
+    rule_class = rule_based_ilae_class(extracted_entities)
+
+    if model_class == "indeterminate":
+        reasons.append("model_indeterminate")
+    elif rule_class is None:
+        reasons.append("rule_undetermined")
+    elif rule_class != model_class:
+        reasons.append("rule_model_disagree")
+
+    for entity, data in extracted_entities.items():
+        value = str(data.get('value', '')).strip().lower()
+        supporting_text = str(data.get('supporting_text', '')).strip().lower()
+        if value in ("", "i don't know"):
+            reasons.append(f"unknown_value:{entity}")
+        if supporting_text in ("", "not found in the clinical note", "i don't know"):
+            reasons.append(f"missing_supporting_text:{entity}")
+
+    for stage in diagnostics.get("json_repaired", []):
+        if stage != "reporter":
+            reasons.append(f"json_repaired:{stage}")
+
+    penalty = sum(CONFIDENCE_PENALTIES[reason.split(":")[0]] for reason in reasons)
+    return max(0.0, 1.0 - penalty), reasons
+
+
+def process_clinical_note_cascade(clinical_note: str, tiers: Sequence[str] = ("lite", "pro"),
+                                  threshold: float = DEFAULT_THRESHOLD, redact_phi: bool = True,
+                                  reporter_model: Optional[str] = None, deadline_s: Optional[float] = None,
+                                  executor: Optional[StageExecutor] = None,
+                                  priority: str = DEFAULT_PRIORITY, tenant: str = DEFAULT_TENANT) -> Tuple[Dict, Dict]:
+    """
+    Process a clinical note, escalating to stronger tiers only when unsure.
+
+    Args:
+        clinical_note: Raw clinical note text
+        tiers: Tier names or model ids for extraction and scoring, cheapest first
+        threshold: Escalate while confidence is below this
+        redact_phi: De-identify the note before it is sent to the model
+        reporter_model: Model for the concise reporter (default: resolved
+            the same way as process_clinical_note)
+        deadline_s: Optional end-to-end time limit in seconds; escalation is
+            skipped when less than 1.5x the last attempt's time is left
+        executor: StageExecutor that runs the agent calls (default:
+            agents.DEFAULT_EXECUTOR)
+        priority: Scheduling class for the agent calls (see scheduler.py)
+        tenant: Client the calls are accounted to for fair queuing
+
+    Returns:
+        Same (final_output, detailed_output) as process_clinical_note, with
+        detailed_output["diagnostics"]["cascade"] describing each attempt
+    """
+    return asyncio.run(process_clinical_note_cascade_async(
+        clinical_note, tiers, threshold, redact_phi, reporter_model, deadline_s, executor, priority, tenant
+    ))
+
+
+async def process_clinical_note_cascade_async(clinical_note: str, tiers: Sequence[str] = ("lite", "pro"),
+                                              threshold: float = DEFAULT_THRESHOLD, redact_phi: bool = True,
+                                              reporter_model: Optional[str] = None,
+                                              deadline_s: Optional[float] = None,
+                                              executor: Optional[StageExecutor] = None,
+                                              priority: str = DEFAULT_PRIORITY,
+                                              tenant: str = DEFAULT_TENANT) -> Tuple[Dict, Dict]:
+    """Async version of process_clinical_note_cascade."""
+    with job_context(priority, tenant):
+        return await _process_clinical_note_cascade(clinical_note, tiers, threshold, redact_phi,
+                                                    reporter_model, deadline_s, executor)
+
+
+async def _process_clinical_note_cascade(clinical_note: str, tiers: Sequence[str], threshold: float,
+                                         redact_phi: bool, reporter_model: Optional[str],
+                                         deadline_s: Optional[float],
+                                         executor: Optional[StageExecutor]) -> Tuple[Dict, Dict]:
+    if not tiers:
+        raise ValueError("A cascade needs at least one tier")
+    started = time.perf_counter()
+    deadline = Deadline(deadline_s) if deadline_s else None
+    execution = {"executor": executor, "deadline": deadline}
+    deid = deidentify(clinical_note) if redact_phi else DeidentifiedNote(text=clinical_note)
+    attempts = []
+    cut_short = False
+
+    for index, tier in enumerate(tiers):
+        model = agents.MODEL_TIERS.get(tier, tier)
+        diagnostics: Dict = {}
+        attempt_started = time.perf_counter()
+        try:
+            extracted_entities = await agents.extract_entities(deid, model, diagnostics, **execution)
+            ilae_result = await agents.calculate_ilae_score(extracted_entities, model, diagnostics, **execution)
+            confidence, reasons = assess_confidence(extracted_entities, ilae_result, diagnostics)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            # Unparseable JSON or missing fields: the least confident answer there is
+            if index + 1 == len(tiers):
+                raise
+            attempts.append({"tier": tier, "confidence": 0.0, "reasons": ["parse_failed"]})
+            continue
+        attempts.append({"tier": tier, "confidence": confidence, "reasons": reasons})
+        if confidence >= threshold:
+            break
+        elapsed = time.perf_counter() - attempt_started
+        if deadline and index + 1 < len(tiers) and deadline.remaining() < 1.5 * elapsed:
+            cut_short = True
+            break
+
+    reporter = agents.resolve_stage_models(
+        {"reporter": reporter_model} if reporter_model else None
+    )["reporter"]
+    concise_result = await agents.report_concise_explanation(ilae_result, extracted_entities, reporter,
+                                                             diagnostics, **execution)
+    diagnostics["cascade"] = {
+        "attempts": attempts,
+        "escalated": len(attempts) > 1,
+        "threshold": threshold,
+        "deadline_cut_short": cut_short,
+    }
+    diagnostics["latency_s"] = time.perf_counter() - started
+    return agents.assemble_outputs(deid, extracted_entities, ilae_result, concise_result, diagnostics)
+
+
+def evaluate_cascades(corpus: List[Tuple[str, str]], configs: Optional[Dict[str, List[str]]] = None,
+                      baseline: str = "flash", threshold: float = DEFAULT_THRESHOLD,
+                      executor: Optional[StageExecutor] = None, priority: str = "bulk") -> Dict[str, Dict]:
+    """
+    Compare cascade configurations over a labelled corpus.
+
+    Args:
+        corpus: (clinical_note, gold ILAE class) pairs
+        configs: Name to tier list (default: CASCADE_CONFIGS)
+        baseline: Config the accuracy delta is measured against
+        threshold: Confidence threshold for escalation
+        executor: StageExecutor that runs the agent calls
+        priority: Scheduling class for the evaluation's agent calls
+
+    Returns:
+        Per-config dict with notes, accuracy, accuracy_delta, escalation_rate,
+        mean_latency_s and errors
+    """
+    configs = configs or CASCADE_CONFIGS
+    report = {}
+    for name, tiers in configs.items():
+        correct = escalated = errors = 0
+        latency = 0.0
+        for clinical_note, gold in corpus:
+            started = time.perf_counter()
+            try:
+                final_output, detailed_output = process_clinical_note_cascade(
+                    clinical_note, tiers=tiers, threshold=threshold, executor=executor,
+                    priority=priority
+                )
+            except Exception as e:
+                print(f"{name}: note failed: {str(e)}")
+                errors += 1
+                latency += time.perf_counter() - started
+                continue
+            latency += time.perf_counter() - started
+            correct += normalize_ilae_score(final_output['ilae_score']) == normalize_ilae_score(gold)
+            escalated += detailed_output['diagnostics']['cascade']['escalated']
+
+        count = max(len(corpus), 1)
+        report[name] = {
+            "tiers": list(tiers),
+            "notes": len(corpus),
+            "accuracy": correct / count,
+            "escalation_rate": escalated / count,
+            "mean_latency_s": latency / count,
+            "errors": errors,
+        }
+
+    reference = report.get(baseline, {}).get("accuracy")
+    for result in report.values():
+        result["accuracy_delta"] = None if reference is None else result["accuracy"] - reference
+    return report
+
+
+def format_cascade_report(report: Dict[str, Dict]) -> str:
+    """Render evaluate_cascades output as a plain-text table."""
+    lines = [f"{'config':<14}{'notes':>7}{'accuracy':>10}{'delta':>9}{'escalated':>11}{'latency':>10}{'errors':>8}"]
+    for name, result in report.items():
+        delta = "n/a" if result["accuracy_delta"] is None else f"{result['accuracy_delta']:+.1%}"
+        lines.append(
+            f"{name:<14}{result['notes']:>7}{result['accuracy']:>10.1%}{delta:>9}"
+            f"{result['escalation_rate']:>11.1%}{result['mean_latency_s']:>9.2f}s{result['errors']:>8}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,288 @@
+"""
+Deadlines and Hedged Requests
+
+Bounds tail latency of the three serial agent calls:
+
+    - Deadline: an end-to-end budget for one note, split into per-stage
+      timeouts. Time a stage does not use rolls over to the later stages.
+    - StageExecutor: runs agent calls under those timeouts, cancelling the
+      underlying event stream when one expires. With hedging on, a stage
+      that runs past its observed p95 latency gets a duplicate request, and
+      whichever answers first wins; the loser is cancelled.
+    - With a scheduler.AgentScheduler attached, every call (hedges
+      included) first waits for a slot in the shared quota.
+    - LatencyInjectingModel: a local stand-in for Gemini with a long-tailed
+      latency distribution, for measuring hedging without API calls.
+"""
+
+import asyncio
+from collections import deque
+import math
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Deque, Dict, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from .scheduler import AgentScheduler
+
+# Share of the remaining deadline each stage may use
+STAGE_DEADLINE_SHARES = {
+    "extractor": 0.5,
+    "calculator": 0.3,
+    "reporter": 0.2,
+}
+
+# Returns the response text, or (text, usage) as agents.run_agent_async does
+AgentRunner = Callable[..., Awaitable[Any]]
+
+
+class StageTimeoutError(TimeoutError):
+    """A pipeline stage did not finish within its share of the deadline."""
+
+    def __init__(self, stage: str, timeout: float):
+        super().__init__(f"Stage '{stage}' exceeded its {timeout:.1f}s deadline")
+        self.stage = stage
+        self.timeout = timeout
+
+
+class Deadline:
+    """End-to-end time budget for one note."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def stage_timeout(self, stages_left: Sequence[str]) -> float:
+        """
+        Timeout for the first of stages_left: its share of whatever time is
+        left, weighted against the stages still to run.
+        """
+        shares = [STAGE_DEADLINE_SHARES.get(stage, 1.0 / len(STAGE_DEADLINE_SHARES)) for stage in stages_left]
+        return self.remaining() * shares[0] / sum(shares)
+
+
+def quantile(sorted_values, q: float) -> float:
+    """Nearest-rank quantile of an already sorted sequence."""
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+class _Attempt:
+    """One request for a stage; dispatched_at is set once it holds a slot."""
+
+    def __init__(self):
+        self.dispatched = asyncio.Event()
+        self.dispatched_at: Optional[float] = None
+        self.task: Optional[asyncio.Future] = None
+
+
+def _withdraw_if_answered(primary_task: asyncio.Future, hedge: _Attempt):
+    """
+    Cancel a hedge as soon as the primary answers, before a slot the
+    primary just freed can start it.
+    """
+    if not primary_task.cancelled() and primary_task.exception() is None:
+        hedge.task.cancel()
+
+
+class StageExecutor:
+    """
+    Runs agent calls with per-stage timeouts and optional hedging.
+
+    One executor is meant to be shared across notes: it learns each stage's
+    latency distribution from recent calls and keeps running metrics.
+    Safe to share between threads that each run their own event loop.
+    """
+
+    def __init__(self, runner: AgentRunner, hedge: bool = False, hedge_quantile: float = 0.95,
+                 min_samples: int = 20, window: int = 500, scheduler: Optional["AgentScheduler"] = None):
+        """
+        Args:
+            runner: Coroutine function (agent, prompt, app_name) -> response,
+                passed back from run unchanged
+            hedge: Launch a duplicate request when a stage runs long
+            hedge_quantile: Observed latency quantile that triggers the hedge
+            min_samples: Calls per stage to observe before hedging starts
+            window: Recent calls per stage kept for the latency estimate
+            scheduler: Optional AgentScheduler every call must get a slot from
+        """
+        self.runner = runner
+        self.scheduler = scheduler
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.min_samples = min_samples
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._window = window
+        self._lock = threading.Lock()
+        self._counts = {"requests": 0, "calls": 0, "hedges": 0, "hedge_wins": 0,
+                        "wasted_calls": 0, "timeouts": 0}
+
+    def hedge_delay(self, stage: str) -> Optional[float]:
+        """Observed latency quantile for a stage, or None until enough samples exist."""
+        with self._lock:
+            samples = sorted(self._latencies.get(stage, ()))
+        if not self.hedge or len(samples) < self.min_samples:
+            return None
+        return quantile(samples, self.hedge_quantile)
+
+    def _record(self, stage: Optional[str] = None, latency: Optional[float] = None, **counts):
+        with self._lock:
+            if stage is not None:
+                self._latencies.setdefault(stage, deque(maxlen=self._window)).append(latency)
+            for key, value in counts.items():
+                self._counts[key] += value
+
+    async def _call(self, stage: str, agent, prompt: str, app_name: str, attempt: "_Attempt") -> Any:
+        if self.scheduler is None:
+            return await self.runner(agent, prompt, app_name)
+        async with self.scheduler.slot(stage):
+            attempt.dispatched_at = time.monotonic()
+            attempt.dispatched.set()
+            return await self.runner(agent, prompt, app_name)
+
+    def _launch(self, stage: str, agent, prompt: str, app_name: str) -> "_Attempt":
+        attempt = _Attempt()
+        if self.scheduler is None:
+            attempt.dispatched_at = time.monotonic()
+            attempt.dispatched.set()
+        attempt.task = asyncio.ensure_future(self._call(stage, agent, prompt, app_name, attempt))
+        return attempt
+
+    async def run(self, stage: str, agent, prompt: str, app_name: str,
+                  timeout: Optional[float] = None) -> Tuple[Any, bool]:
+        """
+        Run one agent call for a stage.
+
+        The timeout covers the whole call, including any wait for a
+        scheduler slot. Latency samples and the hedge timer start only once
+        the primary request holds a slot, so queueing is not mistaken for a
+        slow model and no hedge joins a queue that is already full.
+
+        Returns:
+            Tuple of (the runner's response, whether a hedge request was launched)
+
+        Raises:
+            StageTimeoutError: if no request answered within timeout
+        """
+        started = time.monotonic()
+
+        def time_left() -> Optional[float]:
+            return None if timeout is None else timeout - (time.monotonic() - started)
+
+        primary = self._launch(stage, agent, prompt, app_name)
+        attempts = [primary]
+        delay = self.hedge_delay(stage)
+        winner: Optional[_Attempt] = None
+        finished = 0.0
+        outcome = None
+        try:
+            if delay is not None:
+                granted = asyncio.ensure_future(primary.dispatched.wait())
+                try:
+                    await asyncio.wait([granted, primary.task], timeout=time_left(),
+                                       return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    granted.cancel()
+                if primary.dispatched_at is not None and not primary.task.done():
+                    hedge_in = primary.dispatched_at + delay - time.monotonic()
+                    left = time_left()
+                    if left is None or hedge_in < left:
+                        done, _ = await asyncio.wait([primary.task], timeout=max(0.0, hedge_in))
+                        if not done:
+                            hedge = self._launch(stage, agent, prompt, app_name)
+                            attempts.append(hedge)
+                            primary.task.add_done_callback(lambda task: _withdraw_if_answered(task, hedge))
+
+            by_task = {attempt.task: attempt for attempt in attempts}
+            pending = set(by_task)
+            error: Optional[BaseException] = None
+            while pending:
+                left = time_left()
+                if left is not None and left <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=left, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                for task in done:
+                    if task.cancelled():
+                        continue
+                    if task.exception() is None:
+                        winner, finished, outcome = by_task[task], time.monotonic(), "answered"
+                        return task.result(), len(attempts) > 1
+                    error = task.exception()
+            if error is not None and not pending:
+                outcome = "failed"
+                raise error
+            outcome = "timeout"
+            raise StageTimeoutError(stage, timeout)
+        finally:
+            # Cancel losers and wait, so their event streams are actually closed
+            for attempt in attempts:
+                if not attempt.task.done():
+                    attempt.task.cancel()
+            await asyncio.gather(*(attempt.task for attempt in attempts), return_exceptions=True)
+            # Only requests that got a slot reached the model
+            calls = sum(attempt.dispatched_at is not None for attempt in attempts)
+            hedges = len(attempts) - 1
+            if outcome == "answered":
+                self._record(stage, finished - primary.dispatched_at, requests=1, calls=calls, hedges=hedges,
+                             hedge_wins=int(winner is not primary), wasted_calls=calls - 1)
+            elif outcome == "failed":
+                self._record(requests=1, calls=calls, hedges=hedges)
+            elif outcome == "timeout":
+                self._record(requests=1, calls=calls, hedges=hedges, wasted_calls=calls, timeouts=1)
+
+    def metrics(self) -> Dict:
+        """
+        Running totals plus per-stage latency quantiles.
+
+        hedge_rate is hedges per request; calls counts requests that got a
+        slot and reached the model, and wasted_calls those whose answer was
+        discarded (hedge losers and calls cut off by a timeout). Stage
+        latencies exclude time spent waiting for a scheduler slot.
+        """
+        with self._lock:
+            counts = dict(self._counts)
+            latencies = {stage: sorted(values) for stage, values in self._latencies.items()}
+        counts["hedge_rate"] = counts["hedges"] / counts["requests"] if counts["requests"] else 0.0
+        counts["stages"] = {
+            stage: {"p50": quantile(values, 0.5), "p95": quantile(values, 0.95), "p99": quantile(values, 0.99)}
+            for stage, values in latencies.items() if values
+        }
+        return counts
+
+
+class LatencyInjectingModel:
+    """
+    Local stand-in for the model with realistic tail latency.
+
+    Latency is lognormal around `median_s`; with probability `stall_rate` a
+    call stalls for `stall_factor` times longer, like an occasional slow
+    Gemini stream. Responses come from `respond(agent, prompt)`.
+    """
+
+    def __init__(self, respond: Callable[[object, str], str], median_s: float = 0.05, sigma: float = 0.3,
+                 stall_rate: float = 0.03, stall_factor: float = 10.0, seed: int = 0):
+        self.respond = respond
+        self.median_s = median_s
+        self.sigma = sigma
+        self.stall_rate = stall_rate
+        self.stall_factor = stall_factor
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(self, agent, prompt: str, app_name: str) -> str:
+        self.calls += 1
+        latency = self.median_s * math.exp(self.rng.gauss(0, self.sigma))
+        if self.rng.random() < self.stall_rate:
+            latency *= self.stall_factor
+        try:
+            await asyncio.sleep(latency)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return self.respond(agent, prompt)
@@ -0,0 +1,40 @@
+"""
+Extracted Value Parsing
+
+Turns the free-text values the agents return ("Yes", "80-100", "Class 1")
+into typed values. Shared by the cascade's confidence checks and the
+results store, and kept free of model and API imports so the store and
+analytics can be used without google-adk installed.
+"""
+
+import re
+from typing import Optional
+
+
+def normalize_ilae_score(score) -> str:
+    """Reduce a model's ilae_score to "1"-"6" or "indeterminate"."""
+    if isinstance(score, (int, float)):
+        return str(int(score))
+    text = str(score).lower()
+    if "indeterminate" in text:
+        return "indeterminate"
+    match = re.search(r"[1-6]", text)
+    return match.group() if match else "indeterminate"
+
+
+def parse_yes_no(value) -> Optional[bool]:
+    """Parse an extracted "Yes"/"No" value; None for "I don't know" or anything else."""
+    match = re.match(r"(yes|no)\b", str(value).strip().lower())
+    if match is None:
+        return None
+    return match.group(1) == "yes"
+
+
+def parse_seizure_days(value) -> Optional[float]:
+    """Parse "12", "12.5" or a range such as "80-100" (midpoint); None if unknown."""
+    numbers = [float(n) for n in re.findall(r"\d+(?:\.\d+)?", str(value))]
+    if len(numbers) == 1:
+        return numbers[0]
+    if len(numbers) == 2 and re.search(r"\d\s*(?:-|–|to)\s*\d", str(value)):
+        return sum(numbers) / 2
+    return None
@@ -0,0 +1,237 @@
+"""
+Inter-agent Prompt Building and Token Budgets
+
+Builds the prompts passed between pipeline stages, keeping each within a
+per-stage token budget so prompt size does not grow with how verbose the
+previous model was:
+
+    - Calculator: extracted values plus supporting texts as numbered
+      evidence references (E1, E2, ...). Identical or nested spans share one
+      reference, and spans are trimmed evenly when over budget.
+    - Reporter: score, values and the calculator's key factors as JSON, with
+      the detailed explanation trimmed to whatever budget is left.
+
+Budgets are checked against a local estimate (about four characters per
+token for English text with Gemini tokenizers), since they have to be
+applied before the call is sent. The counts the API reports afterwards are
+recorded next to the estimate.
+"""
+
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
+CHARS_PER_TOKEN = 4
+
+# Per-stage budgets in estimated tokens. The extractor prompt is the note
+# itself and is measured but never trimmed.
+DEFAULT_TOKEN_BUDGETS = {
+    "extractor": 8000,
+    "calculator": 450,
+    "reporter": 300,
+}
+
+ENTITY_LABELS = {
+    "presence_of_seizure_freedom": "seizure_freedom",
+    "presence_of_auras": "auras",
+    "baseline_seizure_days": "baseline_seizure_days",
+    "seizure_days_per_year": "seizure_days_per_year",
+}
+
+_ELLIPSIS = "…"
+
+# A span nested inside a longer one only shares its reference if it is at
+# least this many words: a bare "No" or "2" is a value, not a quote.
+MIN_NESTED_WORDS = 3
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of a prompt."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _normalize(text: str) -> str:
+    return " ".join(str(text).lower().split())
+
+
+def _trim(text: str, max_chars: int) -> str:
+    """Trim text to max_chars at a word boundary, marking the cut."""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max(max_chars - 1, 0)]
+    if " " in cut:
+        cut = cut[:cut.rindex(" ")]
+    return cut + _ELLIPSIS
+
+
+def deduplicate_spans(supporting_texts: Dict[str, str]) -> Tuple[Dict[str, List[str]], Dict[str, str]]:
+    """
+    Give each distinct supporting text a reference id.
+
+    Spans that repeat, or that sit inside a longer span as whole words (and
+    are at least MIN_NESTED_WORDS long), point at the longer span's id
+    instead of being restated.
+
+    Args:
+        supporting_texts: Entity name to supporting text
+
+    Returns:
+        Tuple of (entity name to reference ids, reference id to text)
+    """
+    ordered = sorted(
+        ((name, text) for name, text in supporting_texts.items() if str(text).strip()),
+        key=lambda item: len(item[1]), reverse=True
+    )
+    evidence: Dict[str, str] = {}
+    normalized: Dict[str, str] = {}
+    refs: Dict[str, List[str]] = {name: [] for name in supporting_texts}
+    for name, text in ordered:
+        key = " ".join(re.findall(r"\w+", str(text).lower()))
+        nestable = len(key.split()) >= MIN_NESTED_WORDS
+        match = next((ref for ref, other in normalized.items()
+                      if key == other or (nestable and f" {key} " in f" {other} ")), None)
+        if match is None:
+            match = f"E{len(evidence) + 1}"
+            evidence[match] = " ".join(str(text).split())
+            normalized[match] = key
+        refs[name].append(match)
+    return refs, evidence
+
+
+def fit_spans(evidence: Dict[str, str], max_chars: int) -> Dict[str, str]:
+    """
+    Trim evidence spans so their total length fits max_chars.
+
+    Short spans are kept whole; the longest ones are cut to a shared cap, so
+    one rambling quote cannot crowd out the others.
+    """
+    lengths = sorted(len(text) for text in evidence.values())
+    if sum(lengths) <= max_chars:
+        return dict(evidence)
+    cap, used = 0, 0
+    for i, length in enumerate(lengths):
+        remaining = len(lengths) - i
+        if used + length * remaining > max_chars:
+            cap = (max_chars - used) // remaining
+            break
+        used += length
+    return {ref: _trim(text, max(cap, 16)) for ref, text in evidence.items()}
+
+
+def build_calculation_prompt(extracted_entities: Dict, percent_reduction,
+                             budget: int = DEFAULT_TOKEN_BUDGETS["calculator"]) -> str:
+    """Build the calculator prompt with deduplicated evidence references."""
+    refs, evidence = deduplicate_spans(
+        {name: data.get('supporting_text', '') for name, data in extracted_entities.items()}
+    )
+    if isinstance(percent_reduction, float):
+        percent_reduction = round(percent_reduction, 1)
+    facts = {
+        ENTITY_LABELS.get(name, name): {"value": data.get('value'), "evidence": refs[name]}
+        for name, data in extracted_entities.items()
+    }
+    facts["percent_reduction"] = percent_reduction
+
+    def render(spans: Dict[str, str]) -> str:
+        return ("Calculate the ILAE score. Evidence ids refer to quotes from the note.\n"
+                f"Facts: {json.dumps(facts, separators=(',', ':'))}\n"
+                f"Evidence: {json.dumps(spans, ensure_ascii=False, separators=(',', ':'))}")
+
+    overhead = len(render({ref: "" for ref in evidence}))
+    return render(fit_spans(evidence, budget * CHARS_PER_TOKEN - overhead))
+
+
+def build_report_prompt(ilae_result: Dict, extracted_entities: Dict,
+                        budget: int = DEFAULT_TOKEN_BUDGETS["reporter"]) -> str:
+    """Build the reporter prompt from the score and key factors, not the full explanation."""
+    summary = {
+        "ilae_score": ilae_result.get('ilae_score'),
+        "facts": {ENTITY_LABELS.get(name, name): data.get('value') for name, data in extracted_entities.items()},
+        "key_factors": ilae_result.get('key_factors') or [],
+    }
+    header = f"Summarize this ILAE result for the frontend:\n{json.dumps(summary, separators=(',', ':'))}"
+    room = budget * CHARS_PER_TOKEN - len(header) - len("\nReasoning: ")
+    explanation = " ".join(str(ilae_result.get('detailed_explanation', '')).split())
+    if room < 80 or not explanation:
+        return header
+
+    # Drop repeated sentences, then keep whole sentences up to the budget
+    kept, seen = [], set()
+    for sentence in re.split(r"(?<=[.!?])\s+", explanation):
+        key = _normalize(sentence)
+        if key in seen:
+            continue
+        if sum(len(k) + 1 for k in kept) + len(sentence) > room:
+            break
+        seen.add(key)
+        kept.append(sentence)
+    explanation = " ".join(kept) or _trim(explanation, room)
+    return f"{header}\nReasoning: {explanation}"
+
+
+def build_legacy_calculation_prompt(extracted_entities: Dict, percent_reduction) -> str:
+    """The original prose calculator prompt, kept to measure what compaction saves."""
+    return f"""Calculate the ILAE score using this information:
+
+**Extracted Entities and Supporting Texts:**
+1. Presence of seizure freedom: {extracted_entities['presence_of_seizure_freedom']['value']}
+   - Supporting text: {extracted_entities['presence_of_seizure_freedom']['supporting_text']}
+2. Presence of auras: {extracted_entities['presence_of_auras']['value']}
+   - Supporting text: {extracted_entities['presence_of_auras']['supporting_text']}
+3. Baseline seizure days: {extracted_entities['baseline_seizure_days']['value']}
+   - Supporting text: {extracted_entities['baseline_seizure_days']['supporting_text']}
+4. Seizure days per year: {extracted_entities['seizure_days_per_year']['value']}
+   - Supporting text: {extracted_entities['seizure_days_per_year']['supporting_text']}
+5. Percent reduction: {percent_reduction}
+
+Calculate the ILAE score."""
+
+
+def build_legacy_report_prompt(ilae_result: Dict) -> str:
+    """The original reporter prompt, kept to measure what compaction saves."""
+    return f"Summarize this detailed explanation:\n\n{ilae_result['detailed_explanation']}"
+
+
+def record_usage(diagnostics: Dict, stage: str, prompt: str, budget: Optional[int] = None,
+                 legacy_prompt: Optional[str] = None):
+    """Record a stage's estimated prompt tokens (and the legacy layout's) in diagnostics."""
+    usage = {"prompt_tokens": estimate_tokens(prompt)}
+    if budget is not None:
+        usage["budget"] = budget
+        usage["over_budget"] = usage["prompt_tokens"] > budget
+    if legacy_prompt is not None:
+        usage["legacy_prompt_tokens"] = estimate_tokens(legacy_prompt)
+    diagnostics.setdefault("prompt_usage", {})[stage] = usage
+
+
+def record_reported_usage(diagnostics: Dict, stage: str, usage: Dict[str, int]):
+    """Record the prompt and response tokens the API reported for a stage's call."""
+    stage_usage = diagnostics.setdefault("prompt_usage", {}).setdefault(stage, {})
+    stage_usage["reported_prompt_tokens"] = usage["prompt_tokens"]
+    stage_usage["reported_response_tokens"] = usage["response_tokens"]
+
+
+def summarize_usage(diagnostics_list: List[Dict]) -> Dict[str, Dict]:
+    """
+    Total prompt tokens per stage over many runs, with the saving over the
+    legacy layout. Estimated and reported totals are kept apart; runs with
+    no reported count are tallied under unreported_runs.
+    """
+    totals: Dict[str, Dict] = {}
+    for diagnostics in diagnostics_list:
+        for stage, usage in diagnostics.get("prompt_usage", {}).items():
+            total = totals.setdefault(stage, {"runs": 0, "prompt_tokens": 0, "legacy_prompt_tokens": 0,
+                                              "over_budget": 0, "reported_prompt_tokens": 0,
+                                              "unreported_runs": 0})
+            total["runs"] += 1
+            total["prompt_tokens"] += usage["prompt_tokens"]
+            total["legacy_prompt_tokens"] += usage.get("legacy_prompt_tokens", usage["prompt_tokens"])
+            total["over_budget"] += bool(usage.get("over_budget"))
+            if "reported_prompt_tokens" in usage:
+                total["reported_prompt_tokens"] += usage["reported_prompt_tokens"]
+            else:
+                total["unreported_runs"] += 1
+    for total in totals.values():
+        legacy = total["legacy_prompt_tokens"]
+        total["saving"] = 1 - total["prompt_tokens"] / legacy if legacy else 0.0
+    return totals
@@ -0,0 +1,215 @@
+"""
+Priority-aware Fair Scheduler
+
+Sits in front of agent execution and hands out a fixed number of concurrent
+model-call slots (the shared Gemini quota). When calls have to queue, the
+next free slot goes to:
+
+    1. the highest priority class: interactive, then api, then bulk
+    2. within a class, the call furthest along the pipeline, so notes
+       already in flight finish before new ones start (shortest remaining
+       work first, which minimises mean completion time)
+    3. then weighted fair queuing across tenants (start-time fair queuing),
+       so one client's backfill cannot crowd out another's. Each priority
+       class and stage keeps its own virtual time, since stage ordering
+       decides which of those queues is served first
+
+Priority is strict: a running call is never interrupted, but queued bulk
+calls wait as long as interactive ones are waiting.
+
+One scheduler is shared by every thread and event loop in the process
+(Streamlit runs each session in its own thread); waiters are woken through
+thread-safe futures.
+
+Usage:
+    scheduler = AgentScheduler(max_concurrency=8, tenant_weights={"backfill": 0.5})
+    executor = StageExecutor(run_agent_async, scheduler=scheduler)
+    with job_context("bulk", tenant="backfill"):
+        ...  # agent calls made here are queued as bulk work for "backfill"
+"""
+
+import asyncio
+import concurrent.futures
+import contextlib
+import contextvars
+from collections import deque
+from dataclasses import dataclass, field
+import heapq
+import itertools
+import threading
+import time
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+from .latency import quantile
+
+# Highest priority first
+PRIORITIES = ("interactive", "api", "bulk")
+DEFAULT_PRIORITY = "api"
+DEFAULT_TENANT = "default"
+
+PIPELINE_STAGES = ("extractor", "calculator", "reporter")
+
+
+@dataclass(frozen=True)
+class Job:
+    """Who an agent call is for: its priority class and tenant."""
+    priority: str = DEFAULT_PRIORITY
+    tenant: str = DEFAULT_TENANT
+
+
+_current_job: contextvars.ContextVar = contextvars.ContextVar("seizure_score_job", default=Job())
+
+
+def current_job() -> Job:
+    """The Job that agent calls made from this context are scheduled as."""
+    return _current_job.get()
+
+
+@contextlib.contextmanager
+def job_context(priority: str = DEFAULT_PRIORITY, tenant: str = DEFAULT_TENANT):
+    """Schedule agent calls made inside the block (and tasks started from it) as this job."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority '{priority}'; expected one of {', '.join(PRIORITIES)}")
+    token = _current_job.set(Job(priority, tenant))
+    try:
+        yield
+    finally:
+        _current_job.reset(token)
+
+
+@dataclass(order=True)
+class _Waiter:
+    key: Tuple
+    future: concurrent.futures.Future = field(compare=False)
+    priority: str = field(compare=False)
+    fair_class: Tuple = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    cancelled: bool = field(default=False, compare=False)
+
+
+class AgentScheduler:
+    """
+    Admission control for agent calls: priority classes, stage-aware
+    ordering and weighted fair queuing across tenants.
+    """
+
+    def __init__(self, max_concurrency: int = 8, tenant_weights: Optional[Dict[str, float]] = None,
+                 stage_aware: bool = True, stages: Sequence[str] = PIPELINE_STAGES, window: int = 1000):
+        """
+        Args:
+            max_concurrency: Agent calls allowed to run at once
+            tenant_weights: Relative share per tenant (default 1.0 each)
+            stage_aware: Prefer later pipeline stages within a priority class
+            stages: Pipeline stages in order
+            window: Recent wait times per class kept for the metrics
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.tenant_weights = dict(tenant_weights or {})
+        self.stage_aware = stage_aware
+        self._stage_rank = {stage: i for i, stage in enumerate(stages)}
+        self._lock = threading.Lock()
+        self._queue: List[_Waiter] = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        # Start-time fair queuing state, per (priority, stage rank) queue
+        self._virtual_time: Dict[Tuple[str, int], float] = {}
+        self._finish_tags: Dict[Tuple[str, int, str], float] = {}
+        self._queued = {priority: 0 for priority in PRIORITIES}
+        self._max_queued = {priority: 0 for priority in PRIORITIES}
+        self._dispatched = {priority: 0 for priority in PRIORITIES}
+        self._waits: Dict[str, Deque[float]] = {priority: deque(maxlen=window) for priority in PRIORITIES}
+
+    def _enqueue(self, stage: str, job: Job) -> _Waiter:
+        """Queue a call (lock held), tagging it with its fair-queuing start time."""
+        weight = self.tenant_weights.get(job.tenant, 1.0)
+        stage_rank = self._stage_rank.get(stage, 0) if self.stage_aware else 0
+        fair_class = (job.priority, stage_rank)
+        start = max(self._virtual_time.get(fair_class, 0.0), self._finish_tags.get(fair_class + (job.tenant,), 0.0))
+        self._finish_tags[fair_class + (job.tenant,)] = start + 1.0 / weight
+        waiter = _Waiter(
+            key=(PRIORITIES.index(job.priority), -stage_rank, start, next(self._sequence)),
+            future=concurrent.futures.Future(), priority=job.priority, fair_class=fair_class,
+            enqueued_at=time.monotonic(),
+        )
+        heapq.heappush(self._queue, waiter)
+        self._queued[job.priority] += 1
+        self._max_queued[job.priority] = max(self._max_queued[job.priority], self._queued[job.priority])
+        return waiter
+
+    def _dispatch(self):
+        """Hand free slots to the best waiters (lock held)."""
+        while self._in_flight < self.max_concurrency and self._queue:
+            waiter = heapq.heappop(self._queue)
+            if waiter.cancelled:
+                continue
+            self._queued[waiter.priority] -= 1
+            # A waiter cancelled from its own thread may not have been marked yet
+            if not waiter.future.set_running_or_notify_cancel():
+                waiter.cancelled = True
+                continue
+            self._in_flight += 1
+            # Within a queue calls leave in start-tag order, so this never moves backwards
+            self._virtual_time[waiter.fair_class] = waiter.key[2]
+            self._dispatched[waiter.priority] += 1
+            self._waits[waiter.priority].append(time.monotonic() - waiter.enqueued_at)
+            waiter.future.set_result(None)
+
+    async def acquire(self, stage: str, job: Optional[Job] = None):
+        """Wait for a slot for one agent call of the given stage."""
+        job = job or current_job()
+        if job.priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{job.priority}'")
+        with self._lock:
+            waiter = self._enqueue(stage, job)
+            self._dispatch()
+        try:
+            await asyncio.wrap_future(waiter.future)
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = waiter.future.done() and not waiter.future.cancelled()
+                if not granted and not waiter.cancelled:
+                    waiter.cancelled = True
+                    self._queued[job.priority] -= 1
+            if granted:
+                self.release()
+            raise
+
+    def release(self):
+        """Return a slot and wake the next waiter."""
+        with self._lock:
+            self._in_flight -= 1
+            self._dispatch()
+
+    @contextlib.asynccontextmanager
+    async def slot(self, stage: str, job: Optional[Job] = None):
+        """Hold a slot for the duration of the block."""
+        await self.acquire(stage, job)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def metrics(self) -> Dict:
+        """
+        Slots in use plus, per priority class, the current and peak queue
+        depth, calls dispatched and wait-time quantiles in seconds.
+        """
+        with self._lock:
+            classes = {
+                priority: {
+                    "queued": self._queued[priority],
+                    "max_queued": self._max_queued[priority],
+                    "dispatched": self._dispatched[priority],
+                    "waits": sorted(self._waits[priority]),
+                }
+                for priority in PRIORITIES
+            }
+            in_flight = self._in_flight
+        for stats in classes.values():
+            waits = stats.pop("waits")
+            stats["mean_wait_s"] = sum(waits) / len(waits) if waits else 0.0
+            stats["p95_wait_s"] = quantile(waits, 0.95) if waits else 0.0
+            stats["max_wait_s"] = waits[-1] if waits else 0.0
+        return {"in_flight": in_flight, "max_concurrency": self.max_concurrency, "classes": classes}
@@ -0,0 +1,301 @@
+"""
+Indexed Results Store
+
+Persists pipeline results in an embedded SQLite database so cohort questions
+("ILAE class distribution by surgery type this year") can be answered
+without re-scoring notes.
+
+Rows hold the score and the extracted figures, not the note: notes are
+identified by a SHA-256 hash and patients by a salted hash of their hospital
+number (left empty when no salt is configured). Indexes cover note hash, patient key, note date, ILAE class and
+model/pipeline version; analytics.py runs its aggregations inside SQLite
+against these columns.
+
+Usage:
+    store = ResultsStore("results.db")
+    store.save(note, final_output, detailed_output)
+    for row in store.query(ilae_class=1, date_from="2024-01-01"):
+        ...
+"""
+
+from datetime import datetime
+import hashlib
+import json
+import os
+import re
+import sqlite3
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import __version__ as PIPELINE_VERSION
+from .parsing import normalize_ilae_score, parse_seizure_days, parse_yes_no
+
+COLUMNS = [
+    "note_hash", "patient_key", "note_date", "surgery_type", "ilae_score", "ilae_class",
+    "baseline_seizure_days", "seizure_days_per_year", "percent_reduction", "seizure_free",
+    "auras", "model", "pipeline_version", "created_at", "result_json",
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    note_hash TEXT NOT NULL,
+    patient_key TEXT,
+    note_date TEXT,
+    surgery_type TEXT,
+    ilae_score TEXT NOT NULL,
+    ilae_class INTEGER,
+    baseline_seizure_days REAL,
+    seizure_days_per_year REAL,
+    percent_reduction REAL,
+    seizure_free INTEGER,
+    auras INTEGER,
+    model TEXT,
+    pipeline_version TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    result_json TEXT,
+    UNIQUE (note_hash, model, pipeline_version)
+);
+CREATE INDEX IF NOT EXISTS idx_results_note_hash ON results (note_hash);
+CREATE INDEX IF NOT EXISTS idx_results_patient_date ON results (patient_key, note_date);
+CREATE INDEX IF NOT EXISTS idx_results_note_date ON results (note_date);
+CREATE INDEX IF NOT EXISTS idx_results_ilae_class ON results (ilae_class);
+CREATE INDEX IF NOT EXISTS idx_results_version ON results (model, pipeline_version);
+"""
+
+_DATE_FORMATS = ("%B %d, %Y", "%b %d, %Y", "%d %B %Y", "%Y-%m-%d", "%m/%d/%Y", "%d/%m/%Y")
+
+
+def note_hash(clinical_note: str) -> str:
+    """Stable identifier for a note's text (whitespace-insensitive)."""
+    return hashlib.sha256(" ".join(clinical_note.split()).encode("utf-8")).hexdigest()
+
+
+def patient_key(patient_id: str, salt: Optional[str] = None) -> str:
+    """
+    Salted hash of a hospital number, so rows can be grouped by patient
+    without storing the identifier. The salt defaults to
+    SEIZURE_SCORE_PATIENT_SALT; keep it fixed for a given store.
+
+    Raises:
+        ValueError: if no salt is set. An unsalted hash of a short hospital
+            number can be reversed by hashing every possible number.
+    """
+    salt = os.getenv("SEIZURE_SCORE_PATIENT_SALT") if salt is None else salt
+    if not salt:
+        raise ValueError("A patient key needs a salt: set SEIZURE_SCORE_PATIENT_SALT")
+    return hashlib.sha256(f"{salt}:{patient_id.strip()}".encode("utf-8")).hexdigest()[:32]
+
+
+def extract_note_metadata(clinical_note: str) -> Dict[str, Optional[str]]:
+    """
+    Pull the hospital number, visit date and procedure from a note's header.
+
+    Returns:
+        Dict with patient_id, note_date (ISO format) and surgery_type
+        (lower-case, laterality removed), each None if not found
+    """
+    metadata: Dict[str, Optional[str]] = {"patient_id": None, "note_date": None, "surgery_type": None}
+
+    match = re.search(r"(?:Hospital Number|MRN|Medical Record Number)\s*[:#]?\s*([A-Z0-9-]{4,})", clinical_note)
+    if match:
+        metadata["patient_id"] = match.group(1)
+
+    match = re.search(r"^\s*(?:Visit\s+)?Date:\s*(.+?)\s*$", clinical_note, re.MULTILINE)
+    if match:
+        for fmt in _DATE_FORMATS:
+            try:
+                metadata["note_date"] = datetime.strptime(match.group(1), fmt).date().isoformat()
+                break
+            except ValueError:
+                continue
+
+    match = re.search(r"^\s*-?\s*Procedure:\s*(.+?)\.?\s*$", clinical_note, re.MULTILINE)
+    if match:
+        procedure = re.sub(r"\b(?:left|right|bilateral)\b", "", match.group(1).lower())
+        metadata["surgery_type"] = " ".join(procedure.split()) or None
+
+    return metadata
+
+
+def _bool_column(value) -> Optional[int]:
+    parsed = parse_yes_no(value)
+    return None if parsed is None else int(parsed)
+
+
+class ResultsStore:
+    """SQLite-backed store of pipeline results with a filtered query API."""
+
+    def __init__(self, path: str = "results.db", patient_salt: Optional[str] = None):
+        """
+        Args:
+            path: SQLite database file
+            patient_salt: Salt for patient keys (default:
+                SEIZURE_SCORE_PATIENT_SALT). Without one, rows are saved
+                with no patient key and per-patient analytics are empty.
+        """
+        self.path = path
+        self.patient_salt = patient_salt or os.getenv("SEIZURE_SCORE_PATIENT_SALT") or None
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def build_record(self, clinical_note: str, final_output: Dict, detailed_output: Optional[Dict] = None,
+                     patient_id: Optional[str] = None, note_date: Optional[str] = None,
+                     surgery_type: Optional[str] = None, store_text: bool = False) -> Tuple:
+        """
+        Turn one pipeline result into a row tuple (ordered as COLUMNS).
+
+        Header fields not given are read from the note itself.
+
+        Args:
+            store_text: Also keep the full result JSON. It contains supporting
+                texts quoted from the note, so leave off unless the database
+                is allowed to hold PHI.
+        """
+        metadata = extract_note_metadata(clinical_note)
+        patient_id = patient_id or metadata["patient_id"]
+        entities = final_output.get('extracted_entities', {})
+        diagnostics = (detailed_output or {}).get('diagnostics', {})
+        score = normalize_ilae_score(final_output.get('ilae_score'))
+
+        def value(name):
+            return entities.get(name, {}).get('value')
+
+        baseline = parse_seizure_days(value('baseline_seizure_days'))
+        post = parse_seizure_days(value('seizure_days_per_year'))
+        percent = (baseline - post) / baseline * 100 if baseline and post is not None else None
+
+        return (
+            note_hash(clinical_note),
+            patient_key(patient_id, self.patient_salt) if patient_id and self.patient_salt else None,
+            note_date or metadata["note_date"],
+            surgery_type or metadata["surgery_type"],
+            score,
+            int(score) if score.isdigit() else None,
+            baseline,
+            post,
+            percent,
+            _bool_column(value('presence_of_seizure_freedom')),
+            _bool_column(value('presence_of_auras')),
+            diagnostics.get('models', {}).get('calculator', ""),
+            PIPELINE_VERSION,
+            datetime.now().isoformat(timespec="seconds"),
+            json.dumps({**final_output, **(detailed_output or {})}) if store_text else None,
+        )
+
+    def save(self, clinical_note: str, final_output: Dict, detailed_output: Optional[Dict] = None,
+             **kwargs) -> None:
+        """Save one result; re-scoring the same note with the same model replaces it."""
+        self.save_records([self.build_record(clinical_note, final_output, detailed_output, **kwargs)])
+
+    def save_records(self, records: Iterable[Tuple]) -> int:
+        """Bulk insert row tuples from build_record in one transaction."""
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        with self.connection:
+            cursor = self.connection.executemany(
+                f"INSERT OR REPLACE INTO results ({', '.join(COLUMNS)}) VALUES ({placeholders})", records
+            )
+        return cursor.rowcount
+
+    def where(self, ilae_class: Optional[int] = None, patient_key: Optional[str] = None,
+              note_hash: Optional[str] = None, date_from: Optional[str] = None,
+              date_to: Optional[str] = None, surgery_type: Optional[str] = None,
+              model: Optional[str] = None, pipeline_version: Optional[str] = None) -> Tuple[str, List]:
+        """Build a WHERE clause and parameters for the indexed filters."""
+        clauses, params = [], []
+        for column, value in (("ilae_class", ilae_class), ("patient_key", patient_key),
+                              ("note_hash", note_hash), ("surgery_type", surgery_type),
+                              ("model", model), ("pipeline_version", pipeline_version)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if date_from is not None:
+            clauses.append("note_date >= ?")
+            params.append(date_from)
+        if date_to is not None:
+            clauses.append("note_date < ?")
+            params.append(date_to)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, columns: Optional[List[str]] = None, order_by: str = "id",
+              batch_size: int = 10000, **filters) -> Iterator[sqlite3.Row]:
+        """
+        Stream matching rows without materialising the result set.
+
+        Args:
+            columns: Columns to return (default: all of COLUMNS)
+            order_by: Column to sort by
+            batch_size: Rows fetched from SQLite at a time
+            **filters: See where(); date_to is exclusive
+
+        Yields:
+            sqlite3.Row objects (index or key access)
+        """
+        columns = columns or COLUMNS
+        for column in list(columns) + [order_by]:
+            if column not in COLUMNS and column != "id":
+                raise ValueError(f"Unknown column: {column}")
+        where, params = self.where(**filters)
+        cursor = self.connection.execute(
+            f"SELECT {', '.join(columns)} FROM results{where} ORDER BY {order_by}", params
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+
+    def count(self, **filters) -> int:
+        """Count rows matching the filters."""
+        where, params = self.where(**filters)
+        return self.connection.execute(f"SELECT COUNT(*) FROM results{where}", params).fetchone()[0]
+
+    def export_parquet(self, path: str, batch_size: int = 50000, **filters) -> int:
+        """
+        Export matching rows to a Parquet file in column batches.
+
+        Requires pyarrow (pip install pyarrow).
+
+        Returns:
+            Number of rows written
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet export requires pyarrow: pip install pyarrow")
+
+        schema = pa.schema([
+            ("note_hash", pa.string()), ("patient_key", pa.string()), ("note_date", pa.string()),
+            ("surgery_type", pa.string()), ("ilae_score", pa.string()), ("ilae_class", pa.int8()),
+            ("baseline_seizure_days", pa.float64()), ("seizure_days_per_year", pa.float64()),
+            ("percent_reduction", pa.float64()), ("seizure_free", pa.int8()), ("auras", pa.int8()),
+            ("model", pa.string()), ("pipeline_version", pa.string()), ("created_at", pa.string()),
+        ])
+        where, params = self.where(**filters)
+        cursor = self.connection.execute(
+            f"SELECT {', '.join(schema.names)} FROM results{where} ORDER BY id", params
+        )
+        written = 0
+        with pq.ParquetWriter(path, schema) as writer:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                columns = [[row[i] for row in rows] for i in range(len(schema.names))]
+                writer.write_batch(pa.RecordBatch.from_arrays(
+                    [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                    schema=schema
+                ))
+                written += len(rows)
+        return written
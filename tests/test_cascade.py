@@ -0,0 +1,148 @@
+"""
+Test for the confidence-based model cascade.
+
+Runs offline: agent calls go through a StageExecutor with a canned
+responder keyed on the agent's model, so no API key is needed.
+
+Usage: python tests/test_cascade.py
+"""
+
+import sys
+import os
+import json
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from seizure_score_ai import agents
+from seizure_score_ai.latency import StageExecutor
+from seizure_score_ai.cascade import (
+    assess_confidence, evaluate_cascades, process_clinical_note_cascade, rule_based_ilae_class
+)
+
+
+def entities(seizure_free, auras, baseline, post, supporting_text="quoted from note"):
+    values = {
+        "presence_of_seizure_freedom": seizure_free,
+        "presence_of_auras": auras,
+        "baseline_seizure_days": baseline,
+        "seizure_days_per_year": post,
+    }
+    return {name: {"value": value, "supporting_text": supporting_text} for name, value in values.items()}
+
+
+def fake_executor(responses):
+    """Build an executor whose agent calls return responses[model][agent name]."""
+    async def run_agent(agent, prompt, app_name):
+        return responses[agent.model][agent.name]
+    return StageExecutor(run_agent)
+
+
+def test_rule_based_ilae_class():
+    """Test that extracted values map onto the ILAE scale."""
+    assert rule_based_ilae_class(entities("Yes", "No", "96", "0")) == "1"
+    assert rule_based_ilae_class(entities("Yes", "Yes", "I don't know", "I don't know")) == "2"
+    assert rule_based_ilae_class(entities("No", "No", "96", "2")) == "3"
+    assert rule_based_ilae_class(entities("No", "No", "80-100", "20")) == "4"
+    assert rule_based_ilae_class(entities("No", "Yes", "40", "30")) == "5"
+    assert rule_based_ilae_class(entities("No", "No", "10", "25")) == "6"
+    assert rule_based_ilae_class(entities("No", "No", "I don't know", "20")) is None
+
+
+def test_assess_confidence():
+    """Test that agreement is confident and disagreement or gaps are not."""
+    confident, reasons = assess_confidence(entities("Yes", "No", "96", "0"), {"ilae_score": "1"}, {})
+    assert confident == 1.0 and reasons == []
+
+    unsure, reasons = assess_confidence(entities("Yes", "No", "96", "0"), {"ilae_score": "Class 3"}, {})
+    assert unsure < 0.7 and "rule_model_disagree" in reasons
+
+    unsure, reasons = assess_confidence(
+        entities("No", "No", "I don't know", "20", supporting_text=""), {"ilae_score": "5"},
+        {"json_repaired": ["extractor"]}
+    )
+    assert unsure < 0.7
+    assert "json_repaired:extractor" in reasons
+
+
+def test_cascade_escalates_only_when_unsure():
+    """Test that a confident cheap answer is kept and a doubtful one escalates."""
+    lite, pro = agents.MODEL_TIERS["lite"], agents.MODEL_TIERS["pro"]
+    reporter = json.dumps({"concise_explanation": "Seizure free."})
+    extraction = json.dumps(entities("Yes", "No", "96", "0"))
+    responses = {
+        lite: {
+            "ClinicalInformationExtractor": extraction,
+            "ILAEScoreCalculator": json.dumps({"ilae_score": "1", "detailed_explanation": "No seizures."}),
+        },
+        pro: {
+            "ClinicalInformationExtractor": extraction,
+            "ILAEScoreCalculator": json.dumps({"ilae_score": "1", "detailed_explanation": "No seizures."}),
+        },
+    }
+    for model in responses:
+        responses[model]["ConciseExplanationReporter"] = reporter
+    responses[agents.GEMINI_MODEL] = responses[lite]
+
+    executor = fake_executor(responses)
+    final, detailed = process_clinical_note_cascade("Seizure free.", tiers=["lite", "pro"], executor=executor)
+    assert final["ilae_score"] == "1"
+    assert detailed["diagnostics"]["cascade"]["escalated"] is False
+
+    # The cheap tier now contradicts its own extraction
+    responses[lite]["ILAEScoreCalculator"] = "Sure! " + json.dumps(
+        {"ilae_score": "4", "detailed_explanation": "Guess."}
+    )
+    final, detailed = process_clinical_note_cascade("Seizure free.", tiers=["lite", "pro"], executor=executor)
+    cascade = detailed["diagnostics"]["cascade"]
+    assert cascade["escalated"] is True
+    assert [attempt["tier"] for attempt in cascade["attempts"]] == ["lite", "pro"]
+    assert final["ilae_score"] == "1"
+
+    report = evaluate_cascades([("Seizure free.", "1")], {"lite": ["lite"], "lite+pro": ["lite", "pro"]},
+                               baseline="lite", executor=executor)
+    assert report["lite"]["accuracy"] == 0.0
+    assert report["lite+pro"]["accuracy"] == 1.0
+    assert report["lite+pro"]["accuracy_delta"] == 1.0
+    assert report["lite+pro"]["escalation_rate"] == 1.0
+
+
+def test_cascade_escalates_on_parse_failure():
+    """Test that an unusable cheap-tier reply escalates instead of failing the note."""
+    lite, pro = agents.MODEL_TIERS["lite"], agents.MODEL_TIERS["pro"]
+    working = {
+        "ClinicalInformationExtractor": json.dumps(entities("Yes", "No", "96", "0")),
+        "ILAEScoreCalculator": json.dumps({"ilae_score": "1", "detailed_explanation": "No seizures."}),
+        "ConciseExplanationReporter": json.dumps({"concise_explanation": "Seizure free."}),
+    }
+    responses = {lite: dict(working, ClinicalInformationExtractor="Sorry, I cannot help"), pro: working}
+    responses[agents.GEMINI_MODEL] = working
+    executor = fake_executor(responses)
+
+    final, detailed = process_clinical_note_cascade("Seizure free.", tiers=["lite", "pro"], executor=executor)
+    attempts = detailed["diagnostics"]["cascade"]["attempts"]
+    assert attempts[0] == {"tier": "lite", "confidence": 0.0, "reasons": ["parse_failed"]}
+    assert attempts[1]["tier"] == "pro"
+    assert final["ilae_score"] == "1"
+
+    # Valid JSON missing the entity keys also escalates
+    responses[lite]["ClinicalInformationExtractor"] = json.dumps({"note": "nothing found"})
+    final, detailed = process_clinical_note_cascade("Seizure free.", tiers=["lite", "pro"], executor=executor)
+    assert detailed["diagnostics"]["cascade"]["attempts"][0]["reasons"] == ["parse_failed"]
+
+    # With no tier left to try, the failure reaches the caller
+    try:
+        process_clinical_note_cascade("Seizure free.", tiers=["lite"], executor=executor)
+        assert False, "expected the last tier's failure to be raised"
+    except KeyError:
+        pass
+
+
+if __name__ == "__main__":
+    try:
+        test_rule_based_ilae_class()
+        test_assess_confidence()
+        test_cascade_escalates_only_when_unsure()
+        test_cascade_escalates_on_parse_failure()
+        print("All tests passed!")
+    except Exception as e:
+        print(f"Test failed: {e}")
+        sys.exit(1)
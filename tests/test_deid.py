@@ -0,0 +1,85 @@
+"""
+Test for PHI de-identification pre-stage.
+
+Usage: python tests/test_deid.py
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from seizure_score_ai.deid import deidentify, deidentify_many
+
+
+NOTE = """Epilepsy Surgery Clinic Note
+Date: November 17, 2024
+Patient: Ms. Emily Richards
+Hospital Number: 87654321
+Referring Physician: Dr. Michael Johnson, Neurology
+Contact: (404) 555-0182, 12 Peachtree Street, Atlanta, GA 30303
+
+Surgery Date: 03/12/2023. Seizure-free since 2023.
+Richards reports no auras. Follow-up on 2025-01-15 with Sarah Williams.
+"""
+
+
+def test_replaces_phi():
+    """Test that every PHI type is replaced and years are kept."""
+    deid = deidentify(NOTE)
+
+    for value in ["November 17, 2024", "Emily Richards", "87654321", "Michael Johnson",
+                  "(404) 555-0182", "Peachtree Street", "03/12/2023", "Richards reports",
+                  "2025-01-15", "Sarah Williams"]:
+        assert value not in deid.text, f"{value} leaked"
+
+    kinds = {span.kind for span in deid.spans}
+    assert kinds == {"NAME", "MRN", "DATE", "PHONE", "ADDRESS"}, kinds
+    assert "Seizure-free since 2023." in deid.text, "Bare year should be kept"
+    assert "Ms. [NAME_1]" in deid.text, "Title should stay outside the placeholder"
+
+
+def test_dates_keep_their_year():
+    """Test that only the day and month of a date are replaced."""
+    deid = deidentify("Surgery on March 12, 2023; last seizure in March 2024; seen 03/12/2023 and 2025-01-15.")
+    assert deid.text == ("Surgery on [DATE_1], 2023; last seizure in [DATE_2] 2024; "
+                         "seen [DATE_3]/2023 and 2025-[DATE_4].")
+    assert "March 12" not in deid.text
+
+
+def test_placeholders_are_stable():
+    """Test that repeated values share a placeholder."""
+    deid = deidentify("Dr. Jane Smith saw the patient. Dr. Jane Smith agreed.")
+    assert deid.text == "Dr. [NAME_1] saw the patient. Dr. [NAME_1] agreed."
+
+
+def test_reidentify_round_trip():
+    """Test that placeholders and offsets map back to the original note."""
+    deid = deidentify(NOTE)
+    assert deid.reidentify(deid.text) == NOTE
+
+    # A supporting text quoted by the model maps back to the original span
+    quoted = "[NAME_3] reports no auras."
+    deid_start = deid.text.index(quoted)
+    start, end = deid.to_original_span(deid_start, deid_start + len(quoted))
+    assert NOTE[start:end] == "Richards reports no auras."
+    assert deid.reidentify(quoted) == "Richards reports no auras."
+
+
+def test_deidentify_many_matches_serial():
+    """Test that the process pool returns the same results in order."""
+    notes = [NOTE.replace("Emily", name) for name in ["Emily", "Anna", "John"] * 50]
+    parallel = deidentify_many(notes, processes=2, chunksize=16)
+    assert [d.text for d in parallel] == [deidentify(note).text for note in notes]
+
+
+if __name__ == "__main__":
+    try:
+        test_replaces_phi()
+        test_dates_keep_their_year()
+        test_placeholders_are_stable()
+        test_reidentify_round_trip()
+        test_deidentify_many_matches_serial()
+        print("All tests passed!")
+    except Exception as e:
+        print(f"Test failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,101 @@
+"""
+Test for the synthetic clinic note generator's planning and resume logic.
+
+Runs offline: only the pure planning helpers and the sidecar files are
+exercised, so no API key is needed.
+
+Usage: python tests/test_generate_clinic_notes.py
+"""
+
+import sys
+import os
+import random
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from generate_clinic_notes import (
+    ILAE_CLASSES, LENGTH_PROFILES, NearDuplicateIndex, allocate, build_plan, load_completed,
+    parse_distribution, sample_outcome, save_clinic_note
+)
+from seizure_score_ai.cascade import rule_based_ilae_class
+
+
+def test_allocate_exact_counts():
+    """Test that a class mix turns into exactly the requested number of labels."""
+    weights = parse_distribution("1=0.4,2=0.1,3=0.15,4=0.15,5=0.15,6=0.05", ILAE_CLASSES)
+    labels = allocate(weights, 1000)
+    assert len(labels) == 1000
+    assert {c: labels.count(c) for c in ILAE_CLASSES} == {"1": 400, "2": 100, "3": 150, "4": 150,
+                                                          "5": 150, "6": 50}
+    # Largest remainder: 7 notes over three equal classes still sums to 7
+    assert sorted(allocate(parse_distribution("", ["a", "b", "c"]), 7)) == ["a", "a", "a", "b", "b", "c", "c"]
+
+
+def test_sample_outcome_matches_class():
+    """Test that sampled seizure figures always fall in the target ILAE class."""
+    rng = random.Random(0)
+    for ilae_class in ILAE_CLASSES:
+        for _ in range(200):
+            outcome = sample_outcome(ilae_class, rng)
+            entities = {
+                "presence_of_seizure_freedom": "Yes" if outcome["seizure_days_per_year"] == 0 else "No",
+                "presence_of_auras": "Yes" if outcome["auras"] else "No",
+                "baseline_seizure_days": str(outcome["baseline_seizure_days"]),
+                "seizure_days_per_year": str(outcome["seizure_days_per_year"]),
+            }
+            entities = {name: {"value": value, "supporting_text": "..."} for name, value in entities.items()}
+            assert rule_based_ilae_class(entities) == ilae_class, (ilae_class, outcome)
+
+
+def test_near_duplicate_found():
+    """Test that a lightly edited note is flagged and a different note is not."""
+    notes_dir = os.path.join(os.path.dirname(__file__), '..', 'data', 'test_notes')
+    with open(os.path.join(notes_dir, "clinic_note_1.txt"), "r", encoding="utf-8") as f:
+        note = f.read()
+    with open(os.path.join(notes_dir, "clinic_note_2.txt"), "r", encoding="utf-8") as f:
+        other = f.read()
+
+    index = NearDuplicateIndex(threshold=0.8)
+    index.add(1, index.signature(note))
+    edited = note.replace("Lamotrigine 200 mg", "Lamotrigine 250 mg", 1)
+    assert edited != note
+    assert index.find(index.signature(edited))[0] == 1
+    assert index.find(index.signature(other)) is None
+
+
+def test_load_completed_skips_stale_sidecars():
+    """Test that a sidecar no longer matching the plan is counted as stale, not done."""
+    weights = parse_distribution("", ILAE_CLASSES)
+    profiles = parse_distribution("", list(LENGTH_PROFILES))
+    plan = build_plan(6, weights, profiles, seed=0)
+    assert build_plan(6, weights, profiles, seed=0) == plan
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for spec in plan:
+            save_clinic_note(f"Note {spec['index']}", {**spec, "seed": 0}, tmp)
+        completed, stale = load_completed(tmp, NearDuplicateIndex(), plan, seed=0)
+        assert completed == {1, 2, 3, 4, 5, 6} and stale == 0
+
+        # Relabel one note as if an earlier run had planned a different class
+        spec = plan[0]
+        other_class = next(c for c in ILAE_CLASSES if c != spec["ilae_class"])
+        save_clinic_note("Old note", {**spec, "ilae_class": other_class, "seed": 0}, tmp)
+        completed, stale = load_completed(tmp, NearDuplicateIndex(), plan, seed=0)
+        assert spec["index"] not in completed and stale == 1
+
+        # A different seed invalidates every note
+        completed, stale = load_completed(tmp, NearDuplicateIndex(), plan, seed=1)
+        assert completed == set() and stale == 6
+
+
+if __name__ == "__main__":
+    try:
+        test_allocate_exact_counts()
+        test_sample_outcome_matches_class()
+        test_near_duplicate_found()
+        test_load_completed_skips_stale_sidecars()
+        print("All tests passed!")
+    except Exception as e:
+        print(f"Test failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,91 @@
+"""
+Test for per-stage deadlines and hedged requests.
+
+Runs offline against a fake model whose latency is scripted per call.
+
+Usage: python tests/test_latency.py
+"""
+
+import sys
+import os
+import asyncio
+import json
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from seizure_score_ai.agents import process_clinical_note
+from seizure_score_ai.latency import Deadline, StageExecutor, StageTimeoutError
+
+
+class ScriptedModel:
+    """Fake agent runner that sleeps for the next scripted delay, recording cancellations."""
+
+    def __init__(self, delays, response="{}"):
+        self.delays = list(delays)
+        self.response = response
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(self, agent, prompt, app_name):
+        delay = self.delays[min(self.calls, len(self.delays) - 1)]
+        self.calls += 1
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return self.response
+
+
+def test_deadline_shares():
+    """Test that a stage gets its share of the time left for the stages still to run."""
+    deadline = Deadline(10)
+    assert abs(deadline.stage_timeout(["extractor", "calculator", "reporter"]) - 5.0) < 0.1
+    assert abs(deadline.stage_timeout(["reporter"]) - 10.0) < 0.1
+
+
+def test_stage_timeout_cancels_call():
+    """Test that a timed-out stage raises and its request is cancelled."""
+    model = ScriptedModel([5.0])
+    executor = StageExecutor(model)
+    try:
+        asyncio.run(executor.run("extractor", None, "prompt", "app", timeout=0.05))
+        assert False, "expected a timeout"
+    except StageTimeoutError as e:
+        assert e.stage == "extractor"
+    assert model.cancelled == 1
+    assert executor.metrics()["timeouts"] == 1
+
+    # Through the pipeline, the whole note is bounded by its deadline
+    try:
+        process_clinical_note("Seizure free.", deadline_s=0.1, executor=executor)
+        assert False, "expected a timeout"
+    except TimeoutError:
+        pass
+
+
+def test_hedge_wins_over_stalled_call():
+    """Test that a stalled call is hedged and the hedge's answer is used."""
+    model = ScriptedModel([0.01] * 20 + [5.0, 0.01], response=json.dumps({"ok": True}))
+    executor = StageExecutor(model, hedge=True, min_samples=20)
+
+    async def run_all():
+        for _ in range(20):
+            await executor.run("calculator", None, "prompt", "app")
+        return await executor.run("calculator", None, "prompt", "app", timeout=2.0)
+
+    response, hedged = asyncio.run(run_all())
+    assert hedged and json.loads(response) == {"ok": True}
+    metrics = executor.metrics()
+    assert metrics["hedges"] == 1 and metrics["hedge_wins"] == 1
+    assert model.cancelled == 1
+
+
+if __name__ == "__main__":
+    try:
+        test_deadline_shares()
+        test_stage_timeout_cancels_call()
+        test_hedge_wins_over_stalled_call()
+        print("All tests passed!")
+    except Exception as e:
+        print(f"Test failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,91 @@
+"""
+Test for inter-agent prompt building and token budgets.
+
+Usage: python tests/test_prompts.py
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from seizure_score_ai.prompts import (
+    build_calculation_prompt, build_legacy_calculation_prompt, build_report_prompt,
+    deduplicate_spans, estimate_tokens, record_reported_usage, record_usage, summarize_usage
+)
+
+
+VERBOSE = "Since surgery she has had approximately 10-12 seizure days per year, " * 6
+
+ENTITIES = {
+    "presence_of_seizure_freedom": {"value": "No", "supporting_text": VERBOSE},
+    "presence_of_auras": {"value": "Yes", "supporting_text": "Occasional olfactory auras persist."},
+    "baseline_seizure_days": {"value": "90", "supporting_text": "Approximately 80-100 days per year."},
+    "seizure_days_per_year": {"value": "11", "supporting_text": "approximately 10-12 seizure days per year"},
+}
+
+
+def test_deduplicate_spans():
+    """Test that nested and repeated spans share one reference."""
+    refs, evidence = deduplicate_spans({name: data["supporting_text"] for name, data in ENTITIES.items()})
+    assert len(evidence) == 3
+    assert refs["seizure_days_per_year"] == refs["presence_of_seizure_freedom"]
+
+    # Short values and substrings of other words must keep their own evidence
+    refs, evidence = deduplicate_spans({
+        "auras": "No", "sf": "She has not been seizure free since surgery.",
+        "b": "12 per year", "p": "2",
+    })
+    assert len(evidence) == 4
+    assert evidence[refs["p"][0]] == "2"
+    assert evidence[refs["auras"][0]] == "No"
+
+
+def test_calculation_prompt_respects_budget():
+    """Test that the calculator prompt stays in budget and beats the legacy prompt."""
+    prompt = build_calculation_prompt(ENTITIES, 87.8, budget=150)
+    assert estimate_tokens(prompt) <= 150
+    assert "Occasional olfactory auras persist." in prompt, "Short spans should be kept whole"
+    assert estimate_tokens(prompt) < estimate_tokens(build_legacy_calculation_prompt(ENTITIES, 87.8))
+
+
+def test_report_prompt_respects_budget():
+    """Test that the reporter gets key factors and a trimmed, deduplicated explanation."""
+    ilae_result = {
+        "ilae_score": "4",
+        "detailed_explanation": "Baseline was 90 days. " * 50 + "Post-surgery 11 days. " * 50,
+        "key_factors": ["88% reduction"],
+    }
+    prompt = build_report_prompt(ilae_result, ENTITIES, budget=120)
+    assert estimate_tokens(prompt) <= 120
+    assert "88% reduction" in prompt
+    assert prompt.count("Baseline was 90 days.") == 1
+    assert "Post-surgery 11 days." in prompt
+
+
+def test_summarize_usage():
+    """Test that usage totals report the saving over the legacy layout."""
+    diagnostics = {}
+    record_usage(diagnostics, "calculator", "x" * 400, budget=50, legacy_prompt="x" * 800)
+    unreported = {}
+    record_usage(unreported, "calculator", "x" * 400, budget=50, legacy_prompt="x" * 800)
+    record_reported_usage(diagnostics, "calculator", {"prompt_tokens": 180, "response_tokens": 40})
+    assert diagnostics["prompt_usage"]["calculator"]["prompt_tokens"] == 100
+    assert diagnostics["prompt_usage"]["calculator"]["reported_prompt_tokens"] == 180
+    summary = summarize_usage([diagnostics, diagnostics, unreported])
+    assert summary["calculator"]["runs"] == 3
+    assert summary["calculator"]["over_budget"] == 3
+    assert summary["calculator"]["saving"] == 0.5
+    assert summary["calculator"]["reported_prompt_tokens"] == 360
+    assert summary["calculator"]["unreported_runs"] == 1
+
+
+if __name__ == "__main__":
+    try:
+        test_deduplicate_spans()
+        test_calculation_prompt_respects_budget()
+        test_report_prompt_respects_budget()
+        test_summarize_usage()
+        print("All tests passed!")
+    except Exception as e:
+        print(f"Test failed: {e}")
+        sys.exit(1)
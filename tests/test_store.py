@@ -0,0 +1,148 @@
+"""
+Test for the results store and cohort analytics.
+
+Usage: python tests/test_store.py
+"""
+
+import sys
+import os
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from seizure_score_ai.store import ResultsStore, extract_note_metadata, patient_key
+from seizure_score_ai.analytics import (
+    class_distribution, outcome_trajectories, percent_reduction_stats, transition_matrix
+)
+
+
+def make_note(hospital_number, date, procedure):
+    return f"""Epilepsy Surgery Clinic Note
+Date: {date}
+Hospital Number: {hospital_number}
+Surgical History:
+- Procedure: {procedure}.
+"""
+
+
+def make_result(score, baseline, post, auras="No"):
+    values = {
+        "presence_of_seizure_freedom": "Yes" if post == 0 else "No",
+        "presence_of_auras": auras,
+        "baseline_seizure_days": baseline,
+        "seizure_days_per_year": post,
+    }
+    final_output = {
+        "ilae_score": score,
+        "concise_explanation": "...",
+        "extracted_entities": {name: {"value": value, "supporting_text": "..."} for name, value in values.items()},
+    }
+    detailed_output = {"detailed_explanation": "...", "diagnostics": {"models": {"calculator": "test-model"}}}
+    return final_output, detailed_output
+
+
+SALT = "test-salt"
+
+
+def populate(store):
+    store.save(make_note("11111111", "January 10, 2023", "Left anterior temporal lobectomy"),
+               *make_result("4", "100", "40"))
+    store.save(make_note("11111111", "February 2, 2024", "Left anterior temporal lobectomy"),
+               *make_result("Class 1", "100", "0"))
+    store.save(make_note("22222222", "March 5, 2024", "Right anterior temporal lobectomy"),
+               *make_result("5", "80", "60", auras="Yes"))
+    store.save(make_note("33333333", "April 9, 2024", "Laser ablation"),
+               *make_result("indeterminate", "I don't know", "I don't know"))
+
+
+def test_extract_note_metadata():
+    """Test that header fields are parsed and laterality is dropped."""
+    metadata = extract_note_metadata(make_note("87654321", "November 17, 2024",
+                                               "Right anterior temporal lobectomy"))
+    assert metadata == {"patient_id": "87654321", "note_date": "2024-11-17",
+                        "surgery_type": "anterior temporal lobectomy"}
+
+
+def test_save_and_query():
+    """Test that results are stored without identifiers and can be filtered."""
+    with tempfile.TemporaryDirectory() as tmp, ResultsStore(os.path.join(tmp, "results.db"), SALT) as store:
+        populate(store)
+        # Re-scoring the same note with the same model replaces the row
+        store.save(make_note("22222222", "March 5, 2024", "Right anterior temporal lobectomy"),
+                   *make_result("5", "80", "60", auras="Yes"))
+        assert store.count() == 4
+
+        rows = list(store.query(patient_key=patient_key("11111111", SALT)))
+        assert [row["ilae_class"] for row in rows] == [4, 1]
+        assert rows[0]["percent_reduction"] == 60.0
+        assert all("11111111" not in str(value) for row in rows for value in row)
+
+        assert store.count(date_from="2024-01-01", date_to="2025-01-01") == 3
+        assert store.count(ilae_class=5, surgery_type="anterior temporal lobectomy") == 1
+
+
+def test_no_salt_no_patient_key():
+    """Test that without a salt, hospital numbers are never hashed or stored."""
+    saved = os.environ.pop("SEIZURE_SCORE_PATIENT_SALT", None)
+    try:
+        try:
+            patient_key("11111111")
+            assert False, "expected an unsalted patient key to be refused"
+        except ValueError:
+            pass
+        with tempfile.TemporaryDirectory() as tmp, ResultsStore(os.path.join(tmp, "results.db")) as store:
+            populate(store)
+            assert store.count() == 4
+            assert all(row["patient_key"] is None for row in store.query(["patient_key"]))
+    finally:
+        if saved is not None:
+            os.environ["SEIZURE_SCORE_PATIENT_SALT"] = saved
+
+
+def test_analytics():
+    """Test class distribution, percent reduction statistics and trajectories."""
+    with tempfile.TemporaryDirectory() as tmp, ResultsStore(os.path.join(tmp, "results.db"), SALT) as store:
+        populate(store)
+
+        distribution = class_distribution(store, by="surgery_type", year=2024)
+        atl = {row["ilae_score"]: row for row in distribution if row["group"] == "anterior temporal lobectomy"}
+        assert atl["1"]["count"] == 1 and atl["1"]["share"] == 0.5
+        assert atl["5"]["count"] == 1
+
+        stats = percent_reduction_stats(store)[0]
+        assert stats["count"] == 3
+        assert stats["median"] == 60.0
+        assert stats["max"] == 100.0
+        assert abs(stats["responder_rate"] - 2 / 3) < 1e-9
+
+        trajectory = [row for row in outcome_trajectories(store) if row["patient_key"] == patient_key("11111111", SALT)]
+        assert [row["change"] for row in trajectory] == ["first", "improved"]
+        assert transition_matrix(store) == [{"from_class": 4, "to_class": 1, "count": 1}]
+
+
+def test_export_parquet():
+    """Test the columnar export (skipped without pyarrow)."""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("pyarrow not installed, skipping Parquet export test")
+        return
+    with tempfile.TemporaryDirectory() as tmp, ResultsStore(os.path.join(tmp, "results.db"), SALT) as store:
+        populate(store)
+        path = os.path.join(tmp, "results.parquet")
+        assert store.export_parquet(path, batch_size=3) == 4
+        table = pq.read_table(path)
+        assert table.num_rows == 4
+        assert table.column("ilae_class").to_pylist() == [4, 1, 5, None]
+
+
+if __name__ == "__main__":
+    try:
+        test_extract_note_metadata()
+        test_save_and_query()
+        test_no_salt_no_patient_key()
+        test_analytics()
+        test_export_parquet()
+        print("All tests passed!")
+    except Exception as e:
+        print(f"Test failed: {e}")
+        sys.exit(1)